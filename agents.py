@@ -10,9 +10,10 @@ logger = logging.getLogger(__name__)
 class MarketAgents:
     def __init__(self):
         # We will use ONE stable, powerful model for all agents to ensure success.
+        self.model_name = "groq/llama-3.3-70b-versatile"
         self.main_llm = ChatGroq(
             groq_api_key=Config.GROQ_API_KEY,
-            model_name="groq/llama-3.3-70b-versatile"
+            model_name=self.model_name
         )
 
     def create_search_agent(self):
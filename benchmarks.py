@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the Market Summary Generator
+Every benchmark runs on synthetic data, so no API keys or network access are needed
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from utils import count_tokens
+
+STORY_TEMPLATES = [
+    "The S&P 500 gained {pct}% to {level} as technology shares rallied, with Apple and Microsoft leading the advance.",
+    "The Federal Reserve held interest rates steady at {rate}%, citing cooling inflation and a resilient labor market.",
+    "Oil prices climbed {pct}% to ${level} per barrel after OPEC signalled further production cuts into next quarter.",
+    "The NASDAQ Composite fell {pct}% to {level} as chipmakers slid on renewed export restriction concerns.",
+    "Treasury yields rose to {rate}% after retail sales beat expectations for the third consecutive month.",
+    "The Dow Jones Industrial Average added {pct}% to {level}, lifted by strong earnings from major banks.",
+]
+SOURCES = ["cnbc.com", "reuters.com", "bloomberg.com", "marketwatch.com", "wsj.com", "investing.com"]
+VOCABULARY = (
+    "earnings guidance revenue margin outlook demand supply chain consumer spending payrolls wages "
+    "inflation yields bonds dollar euro yen crude gold copper semiconductors software cloud retail "
+    "banks lenders insurers airlines utilities housing mortgage rates credit spreads volatility "
+    "buyback dividend merger acquisition regulator lawsuit tariff export import factory orders "
+    "sentiment survey forecast downgrade upgrade analyst target estimate quarter annual shares"
+).split()
+FILLER = ["Analysts said", "Traders noted", "Investors expect", "Market strategists added that"]
+
+
+def synthetic_articles(count: int, duplicate_ratio: float = 0.6, seed: int = 7):
+    """Articles where roughly `duplicate_ratio` are rewrites of an earlier story from another outlet"""
+    rng = random.Random(seed)
+    articles, originals = [], []
+    for index in range(count):
+        is_original = not originals or rng.random() >= duplicate_ratio
+        if not is_original:
+            base = rng.choice(originals)
+            words = base['content'].split()
+            # Light rewrite: drop a word or two and add an attribution, as syndicated copy usually does.
+            for _ in range(rng.randint(0, 2)):
+                words.pop(rng.randrange(len(words)))
+            content = f"{' '.join(words)} {rng.choice(FILLER)} the move was widely expected."
+            title = base['title']
+        else:
+            template = rng.choice(STORY_TEMPLATES)
+            content = template.format(
+                pct=round(rng.uniform(0.1, 2.5), 2),
+                level=f"{rng.uniform(50, 20000):,.2f}",
+                rate=round(rng.uniform(3.5, 5.5), 2),
+            ) + ' ' + ' '.join(rng.choice(VOCABULARY) for _ in range(14)) + '.'
+            title = content.split(',')[0][:80]
+        article = {
+            'title': title,
+            'url': f"https://{rng.choice(SOURCES)}/markets/{index}",
+            'content': content,
+            'published_date': '2024-09-16T16:00:00',
+            'score': round(rng.uniform(0.3, 0.99), 3),
+        }
+        articles.append(article)
+        if is_original:
+            originals.append(article)
+    return articles
+
+
+def bench_dedup(sizes):
+    """Prompt tokens saved by near-duplicate clustering on synthetic article sets"""
+    from news_dedup import dedupe_articles
+
+    print(f"{'articles':>9} {'stories':>8} {'clusters':>9} {'tokens in':>10} {'tokens out':>11} {'saved':>7} {'time':>9}")
+    for size in sizes:
+        articles = synthetic_articles(size)
+        start = time.perf_counter()
+        kept = dedupe_articles(articles)
+        elapsed = time.perf_counter() - start
+        before = count_tokens(json.dumps(articles, indent=2))
+        after = count_tokens(json.dumps(kept, indent=2))
+        stories = len({article['title'] for article in articles})
+        print(f"{size:>9} {stories:>8} {len(kept):>9} {before:>10} {after:>11} {1 - after / before:>6.0%} {elapsed * 1000:>7.1f}ms")
+
+
+def bench_market_data(sizes, latency):
+    """Per-symbol requests (the old Ticker.history loop) vs one batched request, under a stand-in provider"""
+    from market_data import SyntheticProvider, summarize_quotes
+
+    print(f"{'symbols':>8} {'per-symbol':>11} {'batched':>9} {'requests':>9} {'speed-up':>9}")
+    for size in sizes:
+        symbols = [f"SYM{i:03d}" for i in range(size)]
+
+        provider = SyntheticProvider(latency=latency)
+        start = time.perf_counter()
+        legacy = {}
+        for symbol in symbols:
+            hist = provider.fetch([symbol], "1mo")
+            close = hist['Close'][symbol].dropna()
+            current_price = close.iloc[-1]
+            prev_close = close.iloc[-2] if len(close) > 1 else current_price
+            legacy[symbol] = round(float((current_price - prev_close) / prev_close * 100), 2)
+        per_symbol = time.perf_counter() - start
+        legacy_requests = provider.requests
+
+        provider = SyntheticProvider(latency=latency)
+        start = time.perf_counter()
+        quotes = summarize_quotes(provider.fetch(symbols, "1mo"), symbols)
+        batched = time.perf_counter() - start
+
+        assert all(quotes[symbol]['change_percent'] == legacy[symbol] for symbol in symbols)
+        print(f"{size:>8} {per_symbol:>10.2f}s {batched:>8.2f}s {legacy_requests:>4} -> {provider.requests:<2} "
+              f"{per_symbol / batched:>8.1f}x")
+
+
+def bench_market_store(sizes, period, latency, bar_latency, store_dir):
+    """Full-period download every run vs the local OHLCV store topped up with the next day's bars"""
+    import shutil
+    import pandas as pd
+    from market_data import SyntheticProvider
+    from ohlcv_store import OHLCVStore, StoreBackedProvider
+
+    day_one = pd.Timestamp.now().normalize() - pd.offsets.BDay(1)
+    day_two = day_one + pd.offsets.BDay(1)
+    print(f"{'symbols':>8} {'full fetch':>11} {'bars':>8} {'store warm':>11} {'bars':>6} {'store read':>11} {'speed-up':>9}")
+    for size in sizes:
+        symbols = [f"SYM{i:03d}" for i in range(size)]
+        shutil.rmtree(store_dir, ignore_errors=True)
+        # Fixture: yesterday's history already in the store
+        OHLCVStore(store_dir).import_frame(SyntheticProvider(end=day_one).fetch(symbols, period))
+
+        upstream = SyntheticProvider(latency=latency, end=day_two, bar_latency=bar_latency)
+        start = time.perf_counter()
+        full = upstream.fetch(symbols, period)
+        full_seconds = time.perf_counter() - start
+        full_bars = upstream.bars_served
+
+        upstream = SyntheticProvider(latency=latency, end=day_two, bar_latency=bar_latency)
+        provider = StoreBackedProvider(upstream, OHLCVStore(store_dir))
+        start = time.perf_counter()
+        stored = provider.fetch(symbols, period)
+        store_seconds = time.perf_counter() - start
+
+        offline = StoreBackedProvider(None, OHLCVStore(store_dir))
+        start = time.perf_counter()
+        offline.fetch(symbols, period)
+        read_seconds = time.perf_counter() - start
+
+        assert np.allclose(stored['Close'][symbols].to_numpy(), full['Close'][symbols].to_numpy())
+        print(f"{size:>8} {full_seconds:>10.2f}s {full_bars:>8} {store_seconds:>10.2f}s {upstream.bars_served:>6} "
+              f"{read_seconds * 1000:>9.1f}ms {full_seconds / store_seconds:>8.1f}x")
+    shutil.rmtree(store_dir, ignore_errors=True)
+
+
+def bench_analytics(sizes, period, repeat):
+    """Vectorised market analytics over a synthetic universe"""
+    from market_analytics import compute_analytics
+    from market_data import SyntheticProvider
+
+    sector_names = ["Technology", "Financials", "Energy", "Health Care", "Consumer", "Industrials", "Utilities"]
+    print(f"{'symbols':>8} {'bars':>5} {'compute':>10} {'fact table':>11} {'tokens':>7}")
+    for size in sizes:
+        symbols = [f"SYM{i:03d}" for i in range(size)]
+        sectors = {symbol: sector_names[i % len(sector_names)] for i, symbol in enumerate(symbols)}
+        frame = SyntheticProvider().fetch(symbols, period)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            facts = compute_analytics(frame, symbols, sectors)
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        prompt = facts.to_prompt()
+        render = time.perf_counter() - start
+        print(f"{size:>8} {len(frame):>5} {min(timings) * 1000:>8.1f}ms {render * 1000:>9.1f}ms {count_tokens(prompt):>7}")
+
+
+def synthetic_summary(rng, words):
+    """Markdown shaped like a formatted summary: title, four labelled bullets and a closing line"""
+    per_bullet = max(words // 4, 1)
+    bullets = [
+        f"* **{label}:** " + ' '.join(rng.choice(VOCABULARY) for _ in range(per_bullet)) + '.'
+        for label in ["Market Performance", "Economic News", "Key Movers", "Outlook"]
+    ]
+    return "# 📈 Daily Market Summary\n\n" + '\n'.join(bullets) + "\n\nData as of market close."
+
+
+def bench_pdf(sizes, words, workers, output_dir):
+    """Single-story PDF build vs per-language sections rendered in a process pool and merged"""
+    from config import Config
+    from pdf_generator import PDFGenerator
+
+    rng = random.Random(11)
+    generator = PDFGenerator(output_dir=output_dir)
+    print(f"{'languages':>10} {'single':>9} {'parallel':>9} {'workers':>8} {'speed-up':>9}")
+    for size in sizes:
+        translations = {f"l{i:02d}": synthetic_summary(rng, words) for i in range(size)}
+        timings = {}
+        for mode, min_sections in (("single", 0), ("parallel", 1)):
+            Config.PDF_PARALLEL_MIN_SECTIONS = min_sections
+            Config.PDF_RENDER_WORKERS = workers
+            start = time.perf_counter()
+            generator.generate_pdf(translations)
+            timings[mode] = time.perf_counter() - start
+        used = min(size, workers or os.cpu_count() or 1)
+        print(f"{size:>10} {timings['single']:>8.2f}s {timings['parallel']:>8.2f}s {used:>8} "
+              f"{timings['single'] / timings['parallel']:>8.1f}x")
+
+
+def bench_pdf_memory(sizes, words, output_dir):
+    """Peak traced memory of a whole-story build vs the streaming builder, one chart-sized image per section"""
+    import tracemalloc
+    from PIL import Image as PILImage
+    from reportlab.platypus import SimpleDocTemplate
+    from pypdf import PdfReader
+    from chart_renderer import CHART_DIR
+    from pdf_generator import PAGE_SIZE, PDFGenerator, ReportSection
+
+    rng = random.Random(5)
+    # Local images are only embedded from the chart directory or the image cache.
+    image_dir = os.path.join(CHART_DIR, "bench_pdf")
+    os.makedirs(image_dir, exist_ok=True)
+    generator = PDFGenerator(output_dir=output_dir)
+
+    def sections(count):
+        for index in range(count):
+            path = os.path.join(image_dir, f"section_{index:04d}.png")
+            if not os.path.exists(path):
+                PILImage.new("RGB", (600, 360), tuple(rng.randrange(256) for _ in range(3))).save(path)
+            yield ReportSection(f"Day {index + 1}", synthetic_summary(rng, words) + f"\n![chart]({path})")
+
+    def whole_story(count):
+        story = generator._title_flowables()
+        for index, section in enumerate(sections(count)):
+            story.extend(generator._section_flowables(section.lang, section.text, section.title, f"s{index}"))
+        SimpleDocTemplate(os.path.join(output_dir, "whole.pdf"), pagesize=PAGE_SIZE).build(story)
+        generator.cleanup_temp_files()
+
+    def streamed(count):
+        generator.generate_report(sections(count), "streamed.pdf")
+
+    print(f"{'sections':>9} {'whole story':>12} {'streamed':>9} {'time whole':>11} {'time streamed':>14}")
+    for size in sizes:
+        peaks, timings = {}, {}
+        for label, run in (("whole", lambda: whole_story(size)),
+                           ("streamed", lambda: streamed(size))):
+            tracemalloc.start()
+            start = time.perf_counter()
+            run()
+            timings[label] = time.perf_counter() - start
+            peaks[label] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+        for name in ("whole.pdf", "streamed.pdf"):
+            embedded = sum(len(page.images) for page in PdfReader(os.path.join(output_dir, name)).pages)
+            assert embedded >= size, f"{name}: only {embedded} of {size} section images embedded"
+        print(f"{size:>9} {peaks['whole']:>10.1f}MB {peaks['streamed']:>7.1f}MB "
+              f"{timings['whole']:>10.2f}s {timings['streamed']:>13.2f}s")
+
+
+def bench_markdown(sizes, words, repeat):
+    """Cold parse throughput, AST cache hits and per-output render time for multi-section summaries"""
+    from markdown_ast import clear_ast_cache, parse_markdown, render_html, render_telegram
+    from pdf_generator import PDFGenerator
+
+    rng = random.Random(11)
+    generator = PDFGenerator(output_dir=os.path.join("output", "bench"))
+    body_style = generator.styles['BodyStyle']
+    print(f"{'sections':>9} {'size':>8} {'cold parse':>11} {'MB/s':>7} {'cache hit':>10} "
+          f"{'pdf':>8} {'telegram':>9} {'html':>8}")
+    for size in sizes:
+        text = '\n\n'.join(
+            f"## Section {index + 1}\n" + synthetic_summary(rng, words)
+            + f"\n- See [the filing](https://example.com/{index}) and `TICK{index}`\n---"
+            for index in range(size)
+        )
+        timings = {}
+        for label, run in (("parse", lambda: (clear_ast_cache(), parse_markdown(text))),
+                           ("hit", lambda: parse_markdown(text)),
+                           ("pdf", lambda: generator._parse_markdown(text, body_style)),
+                           ("telegram", lambda: render_telegram(parse_markdown(text))),
+                           ("html", lambda: render_html(parse_markdown(text)))):
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            timings[label] = best
+        megabytes = len(text.encode('utf-8')) / 1024 / 1024
+        print(f"{size:>9} {megabytes * 1024:>6.0f}KB {timings['parse'] * 1000:>9.2f}ms "
+              f"{megabytes / timings['parse']:>7.1f} {timings['hit'] * 1e6:>8.0f}us "
+              f"{timings['pdf'] * 1000:>6.1f}ms {timings['telegram'] * 1000:>7.2f}ms {timings['html'] * 1000:>6.2f}ms")
+
+
+def bench_telegram(sizes, chats, latency, bandwidth_mbps, output_dir):
+    """Per-image sendPhoto uploads vs albums with file_id reuse, against a simulated Bot API"""
+    import asyncio
+    import httpx
+    from PIL import Image as PILImage
+    from disk_cache import DiskCache
+    from telegram_delivery import TEXT_LIMIT, TelegramDelivery, split_message
+
+    # An over-limit paragraph, line or word followed by more text must split, not recurse forever.
+    for separator in ('\n\n', '\n', ' '):
+        for oversized in ("a " * 2500, "a\n" * 2500, "a" * 5000):
+            text = oversized + separator + "next"
+            chunks = split_message(text)
+            assert chunks and all(len(chunk) <= TEXT_LIMIT for chunk in chunks)
+            assert chunks[-1].endswith("next")
+            assert ''.join(chunks).replace('\n', '').replace(' ', '') == text.replace('\n', '').replace(' ', '')
+
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(3)
+    chat_ids = [f"-100{index:04d}" for index in range(chats)]
+    counter = {'requests': 0, 'bytes': 0}
+
+    async def handler(request):
+        counter['requests'] += 1
+        counter['bytes'] += len(request.content)
+        await asyncio.sleep(latency + len(request.content) / (bandwidth_mbps * 125000))
+        album = request.url.path.endswith('sendMediaGroup')
+        count = request.content.count(b'"type": "photo"') if album else 1
+        messages = [{'message_id': counter['requests'] * 100 + index,
+                     'photo': [{'file_id': f"fid-{counter['requests']}-{index}"}]} for index in range(count)]
+        return httpx.Response(200, json={'ok': True, 'result': messages if album else messages[0]})
+
+    def engine():
+        delivery = TelegramDelivery(token="1:bench", messages_per_second=1000, chat_messages_per_minute=60000,
+                                    file_ids=DiskCache("bench_telegram_file_ids", ttl_seconds=0, max_bytes=1 << 20,
+                                                       path=os.path.join(output_dir, "file_ids.sqlite3")))
+        delivery.file_ids.clear()
+        delivery.client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return delivery
+
+    async def per_image(delivery, paths):
+        async def one_chat(client, chat_id):
+            for path in paths:
+                with open(path, 'rb') as handle:
+                    await delivery.call(client, 'sendPhoto', chat_id, {}, files={'photo': handle})
+        async with delivery.client() as client:
+            await asyncio.gather(*(one_chat(client, chat_id) for chat_id in chat_ids))
+
+    def measure(run):
+        counter.update(requests=0, bytes=0)
+        start = time.perf_counter()
+        asyncio.run(run())
+        return time.perf_counter() - start, counter['requests'], counter['bytes'] / 1024 / 1024
+
+    print(f"{chats} chats, {latency * 1000:.0f}ms per request, {bandwidth_mbps:.0f} Mbit/s upload")
+    print(f"{'images':>7} {'mode':>16} {'requests':>9} {'uploaded':>10} {'time':>8}")
+    for size in sizes:
+        paths = []
+        for index in range(size):
+            path = os.path.join(output_dir, f"chart_{index:03d}.png")
+            if not os.path.exists(path):
+                PILImage.fromarray(rng.integers(0, 255, (300, 500, 3), dtype=np.uint8)).save(path)
+            paths.append(path)
+        delivery = engine()
+        rows = [("per-image", measure(lambda: per_image(engine(), paths))),
+                ("album, cold", measure(lambda: delivery.broadcast(chat_ids, "Charts", paths))),
+                ("album, rerun", measure(lambda: delivery.broadcast(chat_ids, "Charts", paths)))]
+        for label, (seconds, requests, megabytes) in rows:
+            print(f"{size:>7} {label:>16} {requests:>9} {megabytes:>8.1f}MB {seconds:>7.2f}s")
+
+
+def bench_fanout(sizes, latency, rate, concurrency):
+    """Chat-by-chat sends vs the queued fan-out, one routed language per chat, against a simulated Bot API"""
+    import asyncio
+    import httpx
+    from delivery_fanout import FanOutDelivery, build_jobs
+    from telegram_delivery import TelegramDelivery
+
+    async def handler(request):
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={'ok': True, 'result': {'message_id': 1}})
+
+    def engine():
+        delivery = TelegramDelivery(token="1:bench", messages_per_second=rate, chat_messages_per_minute=20)
+        delivery.client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return delivery
+
+    rng = random.Random(13)
+    translations = {lang: synthetic_summary(rng, 250) for lang in ['en', 'hi', 'ar', 'he']}
+    print(f"{latency * 1000:.0f}ms per request, {rate:.0f} messages/s bot limit, {concurrency} workers")
+    print(f"{'chats':>6} {'messages':>9} {'chat by chat':>13} {'fan-out':>9} {'speed-up':>9}")
+    for size in sizes:
+        routes = {lang: [f"-100{lang}{index}" for index in range(index_lang, size, 4)]
+                  for index_lang, lang in enumerate(translations)}
+        jobs = build_jobs(translations, routes)
+
+        async def serial(delivery):
+            async with delivery.client() as client:
+                for job in jobs:
+                    for _, html in job.messages:
+                        await delivery.deliver(client, job.chat_id, html)
+
+        start = time.perf_counter()
+        asyncio.run(serial(engine()))
+        one_by_one = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reports = asyncio.run(FanOutDelivery(engine(), concurrency).run(jobs))
+        fanned = time.perf_counter() - start
+        messages = sum(len(report.message_ids) for report in reports)
+        print(f"{size:>6} {messages:>9} {one_by_one:>12.2f}s {fanned:>8.2f}s {one_by_one / fanned:>8.1f}x")
+
+
+def bench_dag(scale, languages, llm_limit):
+    """Linear stage order vs the DAG scheduler on the pipeline's stage graph with simulated stage times"""
+    import logging
+    from dag import DAGExecutor, Node, gantt_report
+
+    logging.getLogger("dag").setLevel(logging.WARNING)
+    # Typical seconds per stage of a live run
+    durations = {'news': 2, 'market_facts': 3, 'search': 4, 'summary': 5, 'format': 3, 'images': 2,
+                 'translate': 4, 'pdf': 1, 'send': 2}
+
+    def stage(name):
+        def run(**inputs):
+            time.sleep(durations[name.split('_')[0] if name.startswith('translate_') else name] * scale)
+            return name
+        return run
+
+    translate_nodes = [f"translate_{index}" for index in range(languages)]
+    nodes = [
+        Node("news", stage("news"), resource='http'),
+        Node("search", stage("search"), deps=["news"], resource='llm'),
+        Node("market_facts", stage("market_facts"), resource='http'),
+        Node("summary", stage("summary"), deps=["search", "market_facts"], resource='llm'),
+        Node("format", stage("format"), deps=["summary"], resource='llm'),
+        Node("images", stage("images"), deps=["format"], resource='http'),
+    ] + [Node(name, stage(name), deps=["format"], resource='llm') for name in translate_nodes] + [
+        Node("pdf", stage("pdf"), deps=["format", "images"] + translate_nodes),
+        Node("send", stage("send"), deps=["pdf"] + translate_nodes, resource='http'),
+    ]
+    linear = sum(durations[name.split('_')[0] if name.startswith('translate_') else name]
+                 for name in (node.name for node in nodes)) * scale
+
+    # The previous run_daily_summary already translated all languages concurrently.
+    previous = linear - durations['translate'] * (languages - 1) * scale
+
+    result = DAGExecutor(nodes, {'llm': llm_limit, 'http': 4, 'cpu': 1}).run()
+    print(gantt_report(result, {node.name: node for node in nodes}))
+    print(f"\nfully linear {linear:.2f}s, previous pipeline {previous:.2f}s, DAG {result.wall_seconds:.2f}s "
+          f"({previous / result.wall_seconds:.2f}x vs previous)")
+
+
+def bench_charts(sizes, output_dir):
+    """Serial pyplot charts (the old MarketDataTool loop) vs the parallel Agg renderer, cold and cached"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from chart_renderer import ChartJob, render_charts
+    from market_data import SyntheticProvider
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"{'charts':>7} {'pyplot serial':>14} {'parallel Agg':>13} {'mean/chart':>11} {'speed-up':>9} {'cached':>9}")
+    for size in sizes:
+        symbols = [f"SYM{i:03d}" for i in range(size)]
+        frame = SyntheticProvider().fetch(symbols, "3mo")
+
+        start = time.perf_counter()
+        for symbol in symbols:
+            close = frame['Close'][symbol]
+            plt.figure(figsize=(10, 6))
+            plt.plot(close.index, close, linewidth=2)
+            plt.title(f'{symbol} - 3mo Performance')
+            plt.xlabel('Time')
+            plt.ylabel('Price ($)')
+            plt.grid(True, alpha=0.3)
+            plt.xticks(rotation=45)
+            plt.tight_layout()
+            plt.savefig(os.path.join(output_dir, f"legacy_{symbol}.png"), dpi=150, bbox_inches='tight')
+            plt.close()
+        serial = time.perf_counter() - start
+
+        jobs = [
+            ChartJob(symbol, "3mo", frame.index.values, frame['Close'][symbol].to_numpy(dtype=float),
+                     os.path.join(output_dir, f"chart_{symbol}.png"))
+            for symbol in symbols
+        ]
+        for job in jobs:
+            if os.path.exists(job.path):
+                os.remove(job.path)
+        start = time.perf_counter()
+        results = render_charts(jobs)
+        parallel = time.perf_counter() - start
+        mean = sum(result.render_seconds for result in results) / len(results)
+
+        start = time.perf_counter()
+        render_charts(jobs)
+        cached = time.perf_counter() - start
+        print(f"{size:>7} {serial:>13.2f}s {parallel:>12.2f}s {mean * 1000:>9.0f}ms {serial / parallel:>8.1f}x "
+              f"{cached * 1000:>7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Market Summary Generator benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    dedup = subparsers.add_parser("dedup", help="News near-duplicate clustering")
+    dedup.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 800])
+
+    market_data = subparsers.add_parser("market-data", help="Batched vs per-symbol market data fetch")
+    market_data.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500])
+    market_data.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per provider request")
+
+    market_store = subparsers.add_parser("market-store", help="Full download vs local OHLCV store with delta fetch")
+    market_store.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500])
+    market_store.add_argument("--period", default="1y")
+    market_store.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per provider request")
+    market_store.add_argument("--bar-latency", type=float, default=0.00002, help="Simulated transfer seconds per bar")
+    market_store.add_argument("--store-dir", default=os.path.join(".cache", "bench_ohlcv"))
+
+    analytics = subparsers.add_parser("analytics", help="Vectorised market analytics fact table")
+    analytics.add_argument("--sizes", type=int, nargs="+", default=[26, 500, 2000])
+    analytics.add_argument("--period", default="3mo")
+    analytics.add_argument("--repeat", type=int, default=5)
+
+    pdf = subparsers.add_parser("pdf", help="Single-story vs parallel per-language PDF build")
+    pdf.add_argument("--sizes", type=int, nargs="+", default=[4, 10, 20])
+    pdf.add_argument("--words", type=int, default=250, help="Words per language section")
+    pdf.add_argument("--workers", type=int, default=0, help="Process pool size (0 = one per CPU)")
+    pdf.add_argument("--output-dir", default=os.path.join("output", "bench"))
+
+    pdf_memory = subparsers.add_parser("pdf-memory", help="Peak memory of whole-story vs streamed PDF reports")
+    pdf_memory.add_argument("--sizes", type=int, nargs="+", default=[25, 100, 400])
+    pdf_memory.add_argument("--words", type=int, default=250, help="Words per section")
+    pdf_memory.add_argument("--output-dir", default=os.path.join("output", "bench"))
+
+    markdown = subparsers.add_parser("markdown", help="Markdown AST parse throughput and renderer timings")
+    markdown.add_argument("--sizes", type=int, nargs="+", default=[4, 40, 400])
+    markdown.add_argument("--words", type=int, default=250, help="Words per section")
+    markdown.add_argument("--repeat", type=int, default=5)
+
+    telegram = subparsers.add_parser("telegram", help="Per-image uploads vs media-group albums with file_id reuse")
+    telegram.add_argument("--sizes", type=int, nargs="+", default=[4, 10, 25])
+    telegram.add_argument("--chats", type=int, default=5)
+    telegram.add_argument("--latency", type=float, default=0.1, help="Simulated seconds per Bot API request")
+    telegram.add_argument("--bandwidth", type=float, default=20, help="Simulated upload Mbit/s")
+    telegram.add_argument("--output-dir", default=os.path.join("temp_images", "bench_telegram"))
+
+    fanout = subparsers.add_parser("fanout", help="Chat-by-chat vs queued multi-chat Telegram fan-out")
+    fanout.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 400])
+    fanout.add_argument("--latency", type=float, default=0.1, help="Simulated seconds per Bot API request")
+    fanout.add_argument("--rate", type=float, default=25, help="Bot-wide messages per second")
+    fanout.add_argument("--concurrency", type=int, default=32)
+
+    dag = subparsers.add_parser("dag", help="Linear vs DAG-scheduled pipeline stages (simulated stage times)")
+    dag.add_argument("--scale", type=float, default=0.1, help="Multiplier on the simulated stage seconds")
+    dag.add_argument("--languages", type=int, default=3)
+    dag.add_argument("--llm-limit", type=int, default=4)
+
+    charts = subparsers.add_parser("charts", help="Serial pyplot vs parallel Agg chart rendering")
+    charts.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 200])
+    charts.add_argument("--output-dir", default=os.path.join("temp_images", "bench"))
+
+    args = parser.parse_args()
+    if args.benchmark == "dedup":
+        bench_dedup(args.sizes)
+    elif args.benchmark == "market-data":
+        bench_market_data(args.sizes, args.latency)
+    elif args.benchmark == "market-store":
+        bench_market_store(args.sizes, args.period, args.latency, args.bar_latency, args.store_dir)
+    elif args.benchmark == "analytics":
+        bench_analytics(args.sizes, args.period, args.repeat)
+    elif args.benchmark == "pdf":
+        bench_pdf(args.sizes, args.words, args.workers, args.output_dir)
+    elif args.benchmark == "pdf-memory":
+        bench_pdf_memory(args.sizes, args.words, args.output_dir)
+    elif args.benchmark == "markdown":
+        bench_markdown(args.sizes, args.words, args.repeat)
+    elif args.benchmark == "telegram":
+        bench_telegram(args.sizes, args.chats, args.latency, args.bandwidth, args.output_dir)
+    elif args.benchmark == "fanout":
+        bench_fanout(args.sizes, args.latency, args.rate, args.concurrency)
+    elif args.benchmark == "dag":
+        bench_dag(args.scale, args.languages, args.llm_limit)
+    elif args.benchmark == "charts":
+        bench_charts(args.sizes, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
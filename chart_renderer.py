@@ -0,0 +1,205 @@
+# chart_renderer.py
+
+"""
+Parallel chart rendering for market data.
+
+Charts are drawn with matplotlib's object-oriented Agg API (no pyplot state
+machine) in a process pool. Each worker builds one figure template and reuses
+it for every chart it renders, only swapping the line data and title.
+
+Chart files are content-addressed by symbol, period, last bar and style
+version, so an identical chart is served from disk without touching
+matplotlib, and the chart directory is pruned to a size and age limit.
+"""
+
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from config import Config
+from utils import prune_directory
+
+logger = logging.getLogger(__name__)
+
+CHART_SIZE = (10, 6)
+CHART_DPI = 150
+# Bump whenever the chart appearance changes so cached images are redrawn.
+CHART_STYLE_VERSION = 1
+CHART_DIR = "temp_images"
+
+
+@dataclass
+class ChartJob:
+    symbol: str
+    period: str
+    timestamps: np.ndarray  # datetime64[ns]
+    closes: np.ndarray
+    path: str
+
+
+@dataclass
+class ChartResult:
+    symbol: str
+    path: Optional[str]
+    render_seconds: float
+    error: Optional[str] = None
+    cached: bool = False
+
+
+def cached_chart_path(symbol: str, period: str, timestamps: np.ndarray, closes: np.ndarray,
+                      directory: str = CHART_DIR) -> str:
+    """Content-addressed chart path for a series: symbol, period, last bar and style version."""
+    last_bar = str(timestamps[-1]) if len(timestamps) else ''
+    # The last close is included so a still-updating final bar is redrawn.
+    last_close = f"{closes[-1]:.6f}" if len(closes) else ''
+    key = f"{symbol}|{period}|{last_bar}|{last_close}|{len(closes)}|v{CHART_STYLE_VERSION}"
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, f"chart_{symbol}_{digest}.png")
+
+
+class _FigureTemplate:
+    """A pre-styled figure whose line, title and axis limits are swapped per chart."""
+
+    def __init__(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=CHART_SIZE, dpi=CHART_DPI)
+        FigureCanvasAgg(self.figure)
+        self.figure.subplots_adjust(left=0.08, right=0.97, top=0.92, bottom=0.16)
+        self.axes = self.figure.add_subplot(1, 1, 1)
+        self.axes.set_xlabel('Time')
+        self.axes.set_ylabel('Price ($)')
+        self.axes.grid(True, alpha=0.3)
+        self.axes.tick_params(axis='x', labelrotation=45)
+        locator = AutoDateLocator()
+        self.axes.xaxis.set_major_locator(locator)
+        self.axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        (self.line,) = self.axes.plot([], [], linewidth=2)
+
+    def render(self, job: ChartJob):
+        self.line.set_data(job.timestamps.astype('datetime64[ns]'), job.closes)
+        self.axes.set_title(f'{job.symbol} - {job.period} Performance')
+        self.axes.relim()
+        self.axes.autoscale_view()
+        # Written under a temporary name so a killed worker never leaves a partial PNG at the cached path.
+        temp_path = f"{job.path}.{os.getpid()}.tmp"
+        try:
+            self.figure.savefig(temp_path, dpi=CHART_DPI, format='png')
+            os.replace(temp_path, job.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+_template: Optional[_FigureTemplate] = None
+
+
+def render_chart(job: ChartJob) -> ChartResult:
+    """Render one chart with this process's figure template."""
+    global _template
+    start = time.perf_counter()
+    try:
+        if _template is None:
+            _template = _FigureTemplate()
+        _template.render(job)
+        return ChartResult(job.symbol, job.path, time.perf_counter() - start)
+    except Exception as e:
+        return ChartResult(job.symbol, None, time.perf_counter() - start, str(e))
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: the parent runs litellm and DAG worker threads whose locks a fork would copy.
+        _pool = ProcessPoolExecutor(max_workers=Config.CHART_WORKERS or os.cpu_count(),
+                                    mp_context=multiprocessing.get_context('spawn'))
+        atexit.register(_pool.shutdown)
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _render_in_pool(jobs: List[ChartJob], chunksize: int) -> List[ChartResult]:
+    """Map jobs over the worker pool; a pool broken by a crashed worker is replaced and retried once."""
+    try:
+        return list(_get_pool().map(render_chart, jobs, chunksize=chunksize))
+    except BrokenProcessPool as e:
+        logger.warning(f"Chart worker pool broke ({e}); restarting it and retrying")
+        _reset_pool()
+        return list(_get_pool().map(render_chart, jobs, chunksize=chunksize))
+
+
+def render_charts(jobs: List[ChartJob]) -> List[ChartResult]:
+    """
+    Render every job and return results in job order.
+    Jobs whose chart file already exists are served from disk; the rest are drawn
+    in-process for small batches or spread over the worker pool for larger ones.
+    """
+    if not jobs:
+        return []
+    directories = {os.path.dirname(job.path) or '.' for job in jobs}
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    results: List[Optional[ChartResult]] = [None] * len(jobs)
+    pending = []
+    for index, job in enumerate(jobs):
+        if os.path.exists(job.path):
+            os.utime(job.path)  # keep recently used charts at the back of the eviction queue
+            results[index] = ChartResult(job.symbol, job.path, 0.0, cached=True)
+        else:
+            pending.append(index)
+
+    pending_jobs = [jobs[index] for index in pending]
+    if len(pending_jobs) < Config.CHART_PARALLEL_THRESHOLD or Config.CHART_WORKERS == 1:
+        rendered_results = [render_chart(job) for job in pending_jobs]
+    else:
+        chunksize = max(1, len(pending_jobs) // ((Config.CHART_WORKERS or os.cpu_count() or 1) * 4))
+        rendered_results = _render_in_pool(pending_jobs, chunksize)
+    for index, result in zip(pending, rendered_results):
+        results[index] = result
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        if result.error:
+            logger.error(f"Chart for {result.symbol} failed: {result.error}")
+        else:
+            logger.debug(f"Chart for {result.symbol} rendered in {result.render_seconds * 1000:.0f}ms")
+    rendered = [result.render_seconds for result in results if not result.error and not result.cached]
+    cache_hits = sum(1 for result in results if result.cached)
+    if rendered:
+        logger.info(
+            f"Rendered {len(rendered)}/{len(jobs)} charts in {elapsed:.2f}s "
+            f"(per chart: mean {np.mean(rendered) * 1000:.0f}ms, max {max(rendered) * 1000:.0f}ms)"
+        )
+    if cache_hits:
+        logger.info(f"Served {cache_hits}/{len(jobs)} charts from the chart cache")
+
+    for directory in directories:
+        prune_directory(
+            directory,
+            max_bytes=int(Config.CHART_CACHE_MAX_MB * 1024 * 1024),
+            max_age_seconds=Config.CHART_CACHE_MAX_AGE_HOURS * 3600,
+            pattern="chart_*.png",
+        )
+    return results
@@ -0,0 +1,139 @@
+# checkpoint.py
+
+"""
+Run-scoped stage checkpoints for the market summary pipeline.
+
+Every completed stage (search, summary, format, translate_<lang>, pdf, send)
+writes its output to <CHECKPOINT_DIR>/<run_id>/<stage>.json. Files are written
+to a temporary name, fsynced and renamed into place, so a crash never leaves
+a half-written checkpoint. Resuming a run loads the finished stages and only
+executes the rest.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, List
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "run.json"
+
+
+def _write_json_atomic(path: str, payload: Any):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def new_run_id() -> str:
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def _read_manifest(root: str, run_id: str) -> dict:
+    try:
+        with open(os.path.join(root, run_id, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def list_runs(root: str = None, unfinished: bool = False) -> List[str]:
+    """
+    Run ids under `root`, oldest first (ids start with their timestamp).
+    `unfinished` leaves out runs whose manifest marks them finished.
+    """
+    root = root or Config.CHECKPOINT_DIR
+    if not os.path.isdir(root):
+        return []
+    runs = sorted(name for name in os.listdir(root) if os.path.isfile(os.path.join(root, name, MANIFEST)))
+    if unfinished:
+        runs = [run_id for run_id in runs if not _read_manifest(root, run_id).get('finished_at')]
+    return runs
+
+
+class CheckpointStore:
+    """Atomic per-stage outputs of one pipeline run."""
+
+    def __init__(self, run_id: str = None, root: str = None):
+        self.root = root or Config.CHECKPOINT_DIR
+        if run_id == 'latest':
+            runs = list_runs(self.root, unfinished=True)
+            if not runs:
+                raise ValueError(f"No unfinished runs to resume in {self.root}")
+            run_id = runs[-1]
+        self.resumed = run_id is not None
+        if self.resumed and not os.path.isfile(os.path.join(self.root, run_id, MANIFEST)):
+            raise ValueError(f"Unknown run id '{run_id}': no checkpoints in {os.path.join(self.root, run_id)}")
+        self.run_id = run_id or new_run_id()
+        self.directory = os.path.join(self.root, self.run_id)
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        if not self.resumed:
+            _write_json_atomic(os.path.join(self.directory, MANIFEST),
+                               {'run_id': self.run_id, 'created_at': datetime.now().isoformat()})
+
+    def _path(self, stage: str) -> str:
+        return os.path.join(self.directory, f"{stage}.json")
+
+    def has(self, stage: str) -> bool:
+        return os.path.isfile(self._path(stage))
+
+    def load(self, stage: str) -> Any:
+        with open(self._path(stage), encoding='utf-8') as f:
+            return json.load(f)['value']
+
+    def save(self, stage: str, value: Any, seconds: float = None):
+        """Record `stage` as completed with its JSON-serialisable output."""
+        with self._lock:
+            _write_json_atomic(self._path(stage), {
+                'stage': stage,
+                'completed_at': datetime.now().isoformat(),
+                'seconds': round(seconds, 3) if seconds is not None else None,
+                'value': value,
+            })
+
+    def completed(self) -> List[str]:
+        return sorted(name[:-5] for name in os.listdir(self.directory)
+                      if name.endswith('.json') and name != MANIFEST)
+
+    def mark_finished(self):
+        """Record in the manifest that every stage completed, so 'latest' skips this run."""
+        manifest = _read_manifest(self.root, self.run_id) or {'run_id': self.run_id}
+        manifest['finished_at'] = datetime.now().isoformat()
+        with self._lock:
+            _write_json_atomic(os.path.join(self.directory, MANIFEST), manifest)
+
+    def run(self, stage: str, compute: Callable[[], Any], valid: Callable[[Any], bool] = None) -> Any:
+        """
+        Return the checkpointed output of `stage`, or compute and checkpoint it.
+        `valid` can reject a stored output that is no longer usable (e.g. a deleted file).
+        """
+        if self.has(stage):
+            value = self.load(stage)
+            if valid is None or valid(value):
+                logger.info(f"Checkpoint [{self.run_id}]: stage '{stage}' already completed, skipping")
+                return value
+        start = time.perf_counter()
+        value = compute()
+        self.save(stage, value, time.perf_counter() - start)
+        return value
+
+
+def prune_runs(root: str = None, keep: int = None):
+    """Delete all but the newest `keep` runs."""
+    root = root or Config.CHECKPOINT_DIR
+    keep = Config.CHECKPOINT_KEEP_RUNS if keep is None else keep
+    runs = list_runs(root)
+    for run_id in runs[:max(len(runs) - keep, 0)]:
+        shutil.rmtree(os.path.join(root, run_id), ignore_errors=True)
@@ -12,15 +12,80 @@ class Config:
     TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '...your_actual_telegram_chat_id_here...')
     GROQ_API_KEY = os.getenv('GROQ_API_KEY', 'gsk_...your_actual_groq_key_here...')
     
+    # Telegram delivery (Bot API flood limits: ~30 messages/s per bot, 20/min per group chat)
+    TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+    TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_MESSAGES_PER_SECOND', '25'))
+    TELEGRAM_CHAT_MESSAGES_PER_MINUTE = float(os.getenv('TELEGRAM_CHAT_MESSAGES_PER_MINUTE', '20'))
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '5'))
+    TELEGRAM_FILE_ID_TTL_DAYS = int(os.getenv('TELEGRAM_FILE_ID_TTL_DAYS', '30'))
+    # Fan-out: 'en:@market_en,-1001;hi:-1002' routes each language to its chats (empty = English to TELEGRAM_CHAT_ID)
+    TELEGRAM_ROUTES = os.getenv('TELEGRAM_ROUTES', '')
+    TELEGRAM_MIRROR_CHATS = [chat.strip() for chat in os.getenv('TELEGRAM_MIRROR_CHATS', '').split(',') if chat.strip()]
+    TELEGRAM_FANOUT_CONCURRENCY = int(os.getenv('TELEGRAM_FANOUT_CONCURRENCY', '32'))
+    
     # Configuration
     MARKET_TIMEZONE = os.getenv('MARKET_TIMEZONE', 'America/New_York')
     SUMMARY_LANGUAGE = os.getenv('SUMMARY_LANGUAGE', 'en')
     TRANSLATION_LANGUAGES = os.getenv('TRANSLATION_LANGUAGES', 'hi,ar,he').split(',')
+    TRANSLATION_CONCURRENCY = int(os.getenv('TRANSLATION_CONCURRENCY', '4'))
+    TRANSLATION_MODE = os.getenv('TRANSLATION_MODE', 'per_language')  # 'per_language' or 'batched'
+    
+    # LLM rate limits (Groq on-demand tier for llama-3.3-70b-versatile)
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '30'))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '12000'))
+    
+    # Prompt budgets
+    TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', 'cl100k_base')
+    SUMMARY_CONTEXT_TOKEN_BUDGET = int(os.getenv('SUMMARY_CONTEXT_TOKEN_BUDGET', '1500'))
+    
+    # On-disk caches
+    CACHE_DIR = os.getenv('CACHE_DIR', '.cache')
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(6 * 3600)))
+    LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB', '50'))
+    NEWS_SEARCH_CACHE_TTL_SECONDS = int(os.getenv('NEWS_SEARCH_CACHE_TTL_SECONDS', '900'))
+    IMAGE_SEARCH_CACHE_TTL_SECONDS = int(os.getenv('IMAGE_SEARCH_CACHE_TTL_SECONDS', '86400'))
+    SEARCH_CACHE_MAX_MB = float(os.getenv('SEARCH_CACHE_MAX_MB', '20'))
+    TRANSLATION_MEMORY_ENABLED = os.getenv('TRANSLATION_MEMORY_ENABLED', 'true').lower() == 'true'
+    TRANSLATION_MEMORY_TTL_DAYS = int(os.getenv('TRANSLATION_MEMORY_TTL_DAYS', '90'))
+    TRANSLATION_MEMORY_MAX_MB = float(os.getenv('TRANSLATION_MEMORY_MAX_MB', '20'))
+    IMAGE_CACHE_MAX_MB = float(os.getenv('IMAGE_CACHE_MAX_MB', '100'))
+    IMAGE_CACHE_TTL_DAYS = int(os.getenv('IMAGE_CACHE_TTL_DAYS', '7'))  # how long a URL is trusted to serve the same image
+    IMAGE_FETCH_CONCURRENCY = int(os.getenv('IMAGE_FETCH_CONCURRENCY', '8'))
+    
+    # Market data
+    MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'yfinance')  # 'yfinance', 'synthetic' or 'store'
+    MARKET_DATA_STORE = os.getenv('MARKET_DATA_STORE', 'true').lower() == 'true'
+    OHLCV_STORE_DIR = os.getenv('OHLCV_STORE_DIR', os.path.join(CACHE_DIR, 'ohlcv'))
+    MARKET_WATCHLIST = os.getenv(
+        'MARKET_WATCHLIST',
+        'SPY,QQQ,DIA,IWM,AAPL,MSFT,NVDA,AVGO,GOOGL,META,NFLX,AMZN,TSLA,WMT,COST,'
+        'JPM,BAC,GS,V,XOM,CVX,UNH,JNJ,LLY,CAT,BA'
+    ).split(',')
+    MARKET_ANALYTICS_PERIOD = os.getenv('MARKET_ANALYTICS_PERIOD', '3mo')  # needs 50+ bars for the slow average
+    CHART_WORKERS = int(os.getenv('CHART_WORKERS', '0'))  # 0 = one per CPU
+    CHART_PARALLEL_THRESHOLD = int(os.getenv('CHART_PARALLEL_THRESHOLD', '4'))
+    CHART_CACHE_MAX_MB = float(os.getenv('CHART_CACHE_MAX_MB', '100'))
+    CHART_CACHE_MAX_AGE_HOURS = float(os.getenv('CHART_CACHE_MAX_AGE_HOURS', '72'))
     
     # Output settings
     MAX_SUMMARY_WORDS = 500
     OUTPUT_DIR = 'outputs'
     PDF_FILENAME = 'daily_market_summary.pdf'
+    DELIVERY_REPORT_FILENAME = 'delivery_report.json'
+    CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', os.path.join('outputs', 'runs'))
+    CHECKPOINT_KEEP_RUNS = int(os.getenv('CHECKPOINT_KEEP_RUNS', '14'))
+    FONT_DIR = os.getenv('FONT_DIR', 'fonts')  # Noto TTFs for Arabic, Hebrew and Devanagari
+    PDF_PARALLEL_MIN_SECTIONS = int(os.getenv('PDF_PARALLEL_MIN_SECTIONS', '8'))  # 0 = always one story
+    PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', '0'))  # 0 = one per CPU
+    
+    # Pipeline stage scheduler: how many stages may run at once per resource
+    DAG_LLM_CONCURRENCY = int(os.getenv('DAG_LLM_CONCURRENCY', str(TRANSLATION_CONCURRENCY)))
+    DAG_HTTP_CONCURRENCY = int(os.getenv('DAG_HTTP_CONCURRENCY', '4'))
+    DAG_CPU_CONCURRENCY = int(os.getenv('DAG_CPU_CONCURRENCY', '0'))  # 0 = one per CPU
+    
+    # HTTP settings
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+    SEARCH_CONCURRENCY = int(os.getenv('SEARCH_CONCURRENCY', '5'))
     
     # News search settings
     NEWS_SEARCH_QUERIES = [
@@ -30,6 +95,7 @@ class Config:
         "US economic indicators",
         "major stock movements today"
     ]
+    NEWS_DEDUP_THRESHOLD = float(os.getenv('NEWS_DEDUP_THRESHOLD', '0.5'))  # estimated Jaccard similarity
     
     # Validation
     @classmethod
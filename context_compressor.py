@@ -0,0 +1,185 @@
+# context_compressor.py
+
+"""
+Extractive compression of stage context to a token budget.
+
+Sentences are ranked with BM25 against the market topics the search stage
+looks for, then kept best-first until the budget is spent. Sentences holding
+numbers or tickers are always kept, since those are the facts the summary
+is built from. Every kept sentence brings its enclosing headings and keys
+(a markdown heading, a JSON object's key line, a 'Label:' line), so a bare
+'"close": 95.50' still says which instrument it belongs to. The surviving
+sentences keep their original order and lines.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Iterable, List, Optional, Set, Tuple
+
+from config import Config
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+(?=["\'(\[A-Z0-9])')
+_LINE_MARKER = re.compile(r'^\s*(?:[-*+]|\d+[.)]|#{1,6})\s+')
+_TERM = re.compile(r'[a-z0-9&]+')
+_NUMBER = re.compile(r'\d')
+# Explicit tickers only ($AAPL, NASDAQ:AAPL); bare capitals count only for known symbols.
+_TICKER = re.compile(r'\$[A-Z]{1,5}\b|\b(?:NYSE|NASDAQ|Nasdaq|AMEX):\s?[A-Z]{1,5}\b')
+_CAPITALS = re.compile(r'\b[A-Z]{1,5}\b')
+_HEADING = re.compile(r'^\s*(#{1,6})\s')
+_OPENER = re.compile(r'[{\[:]\s*$')  # a key line whose value follows on the next lines
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'e', 'for', 'from', 'g', 'has', 'in', 'is', 'it',
+    'its', 'of', 'on', 'or', 'that', 'the', 'to', 'was', 'were', 'with',
+}
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def _terms(text: str) -> List[str]:
+    return [term for term in _TERM.findall(text.lower()) if term not in _STOPWORDS]
+
+
+def known_symbols() -> Set[str]:
+    """The watchlist symbols, the only bare capitalised words treated as tickers."""
+    return {symbol.strip().upper() for symbol in Config.MARKET_WATCHLIST if symbol.strip()}
+
+
+def is_protected(sentence: str, symbols: Optional[Iterable[str]] = None) -> bool:
+    """Sentences with numbers or tickers carry the facts and are never dropped."""
+    if _NUMBER.search(sentence) or _TICKER.search(sentence):
+        return True
+    symbols = known_symbols() if symbols is None else set(symbols)
+    return any(word in symbols for word in _CAPITALS.findall(sentence))
+
+
+def split_sentences(text: str) -> List[Tuple[int, str]]:
+    """(line number, sentence) pairs, so the original layout can be rebuilt. Bullet markers are left out."""
+    sentences = []
+    for line_number, line in enumerate(text.split('\n')):
+        for sentence in _SENTENCE_BREAK.split(_LINE_MARKER.sub('', line.strip())):
+            if sentence.strip():
+                sentences.append((line_number, sentence.strip()))
+    return sentences
+
+
+def enclosing_lines(lines: List[str]) -> List[List[int]]:
+    """
+    For every line, the numbers of the lines that label it: the markdown headings
+    above it, and less-indented key lines ending in '{', '[' or ':' that it is nested under.
+    """
+    headings: List[Tuple[int, int]] = []  # (level, line number)
+    openers: List[Tuple[int, int]] = []  # (indent, line number)
+    parents = []
+    for number, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            parents.append([])
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            headings = [entry for entry in headings if entry[0] < level]
+            openers = []
+            parents.append([line_number for _, line_number in headings])
+            headings.append((level, number))
+            continue
+        indent = len(line) - len(line.lstrip())
+        while openers and openers[-1][0] >= indent:
+            openers.pop()
+        parents.append([line_number for _, line_number in headings + openers])
+        if _OPENER.search(stripped):
+            openers.append((indent, number))
+    return parents
+
+
+def _line_marker(line: str) -> str:
+    match = _LINE_MARKER.match(line.strip())
+    return match.group(0) if match else ''
+
+
+def bm25_scores(sentences: List[str], query: str) -> List[float]:
+    """Okapi BM25 score of every sentence against the query terms."""
+    documents = [_terms(sentence) for sentence in sentences]
+    if not documents:
+        return []
+    average_length = sum(len(doc) for doc in documents) / len(documents) or 1.0
+    document_frequency = Counter(term for doc in documents for term in set(doc))
+    total = len(documents)
+    query_terms = set(_terms(query))
+
+    scores = []
+    for doc in documents:
+        frequencies = Counter(doc)
+        score = 0.0
+        for term in query_terms:
+            tf = frequencies.get(term)
+            if not tf:
+                continue
+            df = document_frequency[term]
+            idf = math.log((total - df + 0.5) / (df + 0.5) + 1.0)
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / average_length))
+        scores.append(score)
+    return scores
+
+
+def compress_context(text: str, topics: List[str], token_budget: int) -> str:
+    """Keep the most topic-relevant sentences (plus every fact-bearing one) within `token_budget` tokens."""
+    if not text:
+        return text
+    tokens_before = count_tokens(text)
+    if tokens_before <= token_budget:
+        logger.info(f"Context compression: {tokens_before} tokens already within budget of {token_budget}")
+        return text
+
+    sentences = split_sentences(text)
+    costs = [count_tokens(sentence) for _, sentence in sentences]
+    scores = bm25_scores([sentence for _, sentence in sentences], ' '.join(topics))
+    source_lines = text.split('\n')
+    parents = enclosing_lines(source_lines)
+    by_line = {}
+    for index, (line_number, _) in enumerate(sentences):
+        by_line.setdefault(line_number, []).append(index)
+
+    def with_labels(index: int) -> Set[int]:
+        """The sentence plus every sentence on the lines that label it."""
+        return {index}.union(*(by_line.get(parent, []) for parent in parents[sentences[index][0]]))
+
+    symbols = known_symbols()
+    keep = set()
+    for index, (_, sentence) in enumerate(sentences):
+        if is_protected(sentence, symbols):
+            keep |= with_labels(index)
+    spent = sum(costs[index] for index in keep)
+    if spent > token_budget:
+        logger.warning(
+            f"Context compression: fact-bearing sentences alone need {spent} tokens (budget {token_budget})"
+        )
+    for index in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        if index in keep:
+            continue
+        added = with_labels(index) - keep
+        cost = sum(costs[i] for i in added)
+        if spent + cost <= token_budget:
+            keep |= added
+            spent += cost
+
+    lines = {}
+    for index in sorted(keep):
+        line_number, sentence = sentences[index]
+        lines.setdefault(line_number, []).append(sentence)
+    compressed = '\n'.join(
+        _line_marker(source_lines[line_number]) + ' '.join(lines[line_number]) for line_number in sorted(lines)
+    )
+
+    tokens_after = count_tokens(compressed)
+    logger.info(
+        f"Context compression: {tokens_before} -> {tokens_after} tokens "
+        f"({len(keep)}/{len(sentences)} sentences kept, budget {token_budget})"
+    )
+    return compressed
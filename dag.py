@@ -0,0 +1,249 @@
+# dag.py
+
+"""
+Small declarative DAG executor for the pipeline stages.
+
+Each Node names the nodes it depends on and the resource it uses ('llm',
+'http' or 'cpu'). A node starts as soon as all of its dependencies have
+finished and a slot for its resource is free, so independent stages overlap
+(market data with the news search, image downloads with the translations).
+Dependency results are passed to the node's function as keyword arguments.
+
+With a CheckpointStore, a node whose output is already checkpointed is
+loaded instead of run, inputs needed only by such nodes are not run at all,
+and every finished node is checkpointed. After each run a Gantt chart and
+the critical path are logged.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+GANTT_WIDTH = 48
+
+
+@dataclass
+class Node:
+    name: str
+    fn: Callable[..., Any]
+    deps: Sequence[str] = ()
+    resource: str = 'cpu'
+    optional: bool = False  # a failure yields None instead of stopping the nodes that depend on it
+    checkpoint: bool = True
+    valid: Optional[Callable[[Any], bool]] = None  # rejects a stale checkpoint, e.g. a deleted file
+
+
+@dataclass
+class NodeTiming:
+    name: str
+    resource: str
+    ready: float = 0.0  # seconds since the run started
+    start: float = 0.0
+    end: float = 0.0
+    status: str = 'pending'  # done, cached, failed, skipped, not needed
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class DAGResult:
+    results: Dict[str, Any]
+    timings: Dict[str, NodeTiming]
+    wall_seconds: float
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+
+
+class DAGError(RuntimeError):
+    """A required node failed; `result` holds everything that did finish."""
+
+    def __init__(self, message: str, result: DAGResult):
+        super().__init__(message)
+        self.result = result
+
+
+class DAGExecutor:
+    """Runs nodes once their inputs are ready, under per-resource concurrency limits."""
+
+    def __init__(self, nodes: List[Node], limits: Dict[str, int], checkpoints=None):
+        self.nodes = {node.name: node for node in nodes}
+        if len(self.nodes) != len(nodes):
+            raise ValueError("Duplicate node names in DAG")
+        self.limits = dict(limits)
+        self.checkpoints = checkpoints
+        self._semaphores = {resource: threading.BoundedSemaphore(max(1, limit))
+                            for resource, limit in self.limits.items()}
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, state = [], {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle in DAG: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dep in self.nodes[name].deps:
+                if dep not in self.nodes:
+                    raise ValueError(f"Node '{name}' depends on unknown node '{dep}'")
+                visit(dep, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name, [])
+        for node in self.nodes.values():
+            if node.resource not in self.limits:
+                raise ValueError(f"Node '{node.name}' uses resource '{node.resource}' without a limit")
+        return order
+
+    def _execute(self, node: Node, inputs: Dict[str, Any], timing: NodeTiming, started: float) -> Any:
+        with self._semaphores[node.resource]:
+            timing.start = time.perf_counter() - started
+            try:
+                return node.fn(**inputs)
+            finally:
+                timing.end = time.perf_counter() - started
+
+    def _load_checkpoints(self) -> Dict[str, Any]:
+        """Outputs of the nodes whose checkpoints can be reused."""
+        cached = {}
+        if self.checkpoints is None:
+            return cached
+        for node in self.nodes.values():
+            if node.checkpoint and self.checkpoints.has(node.name):
+                value = self.checkpoints.load(node.name)
+                if node.valid is None or node.valid(value):
+                    cached[node.name] = value
+        return cached
+
+    def _needed(self, cached: Dict[str, Any]) -> set:
+        """Nodes that must run: not checkpointed, and a final node or an input of another node that runs."""
+        dependents: Dict[str, List[str]] = {name: [] for name in self.nodes}
+        for node in self.nodes.values():
+            for dep in node.deps:
+                dependents[dep].append(node.name)
+        needed = set()
+        for name in reversed(self.order):
+            if name not in cached and (not dependents[name] or any(d in needed for d in dependents[name])):
+                needed.add(name)
+        return needed
+
+    def run(self) -> DAGResult:
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        errors: Dict[str, BaseException] = {}
+        timings = {name: NodeTiming(name, node.resource) for name, node in self.nodes.items()}
+        cached = self._load_checkpoints()
+        needed = self._needed(cached)
+        for name in self.order:
+            if name in cached:
+                results[name] = cached[name]
+                timings[name].status = 'cached'
+            elif name not in needed:
+                timings[name].status = 'not needed'
+        if cached:
+            logger.info(f"DAG: loaded {', '.join(cached)} from checkpoints")
+        remaining = [name for name in self.order if name in needed]
+        running = {}
+
+        def now() -> float:
+            return time.perf_counter() - started
+
+        workers = sum(max(1, limit) for limit in self.limits.values())
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dag") as pool:
+            while remaining or running:
+                for name in list(remaining):
+                    node = self.nodes[name]
+                    deps = [timings[dep].status for dep in node.deps]
+                    if any(status in ('failed', 'skipped') for status in deps):
+                        timings[name].status = 'skipped'
+                        remaining.remove(name)
+                        logger.warning(f"DAG: skipping '{name}' because a required input failed")
+                        continue
+                    if not all(status in ('done', 'cached') for status in deps):
+                        continue
+                    remaining.remove(name)
+                    timings[name].ready = now()
+                    inputs = {dep: results.get(dep) for dep in node.deps}
+                    running[pool.submit(self._execute, node, inputs, timings[name], started)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    node, timing = self.nodes[name], timings[name]
+                    try:
+                        results[name] = future.result()
+                        timing.status = 'done'
+                        if self.checkpoints is not None and node.checkpoint and results[name] is not None:
+                            self.checkpoints.save(name, results[name], timing.duration)
+                    except Exception as e:
+                        errors[name] = e
+                        if node.optional:
+                            logger.error(f"DAG: optional node '{name}' failed, continuing without it: {e}")
+                            results[name] = None
+                            timing.status = 'done'
+                        else:
+                            logger.error(f"DAG: node '{name}' failed: {e}")
+                            timing.status = 'failed'
+
+        result = DAGResult(results, timings, now(), errors)
+        logger.info(gantt_report(result, self.nodes))
+        failed = [name for name, timing in timings.items() if timing.status == 'failed']
+        if failed:
+            raise DAGError(f"DAG nodes failed: {', '.join(failed)} ({errors[failed[0]]})", result)
+        return result
+
+
+def critical_path(result: DAGResult, nodes: Dict[str, Node]) -> List[str]:
+    """The chain of nodes that determined the run's end time, walking back through the latest-finishing input."""
+    ran = {name for name, timing in result.timings.items() if timing.status == 'done'}
+    if not ran:
+        return []
+    current = max(ran, key=lambda name: result.timings[name].end)
+    path = [current]
+    # Checkpointed inputs took no time in this run, so the walk stops at them.
+    while any(dep in ran for dep in nodes[current].deps):
+        current = max((dep for dep in nodes[current].deps if dep in ran), key=lambda dep: result.timings[dep].end)
+        path.append(current)
+    return path[::-1]
+
+
+def gantt_report(result: DAGResult, nodes: Dict[str, Node]) -> str:
+    """Text Gantt chart of the run plus its critical path."""
+    order = {name: index for index, name in enumerate(nodes)}
+    timings = sorted(result.timings.values(),
+                     key=lambda timing: (timing.status not in ('done', 'failed'), timing.start, order[timing.name]))
+    wall = max(result.wall_seconds, 1e-9)
+    busy = sum(timing.duration for timing in timings if timing.status == 'done')
+    path = critical_path(result, nodes)
+    width = max([len(timing.name) for timing in timings] + [4])
+    lines = [f"DAG run: {result.wall_seconds:.1f}s wall, {busy:.1f}s of stage time ({busy / wall:.1f}x overlap)"]
+    for timing in timings:
+        if timing.status in ('done', 'failed'):
+            first = int(timing.start / wall * GANTT_WIDTH)
+            length = max(1, int(round(timing.duration / wall * GANTT_WIDTH)))
+            bar = ' ' * first + ('#' if timing.name in path else '=') * length
+            detail = f"{timing.start:6.1f}-{timing.end:6.1f}s"
+            if timing.start - timing.ready >= 0.05:
+                detail += f" (waited {timing.start - timing.ready:.1f}s for {timing.resource})"
+        else:
+            bar, detail = '', timing.status
+        if timing.status == 'failed':
+            detail += " FAILED"
+        lines.append(f"  {timing.name:<{width}} {timing.resource:<4} |{bar[:GANTT_WIDTH]:<{GANTT_WIDTH}}| {detail}")
+    if path:
+        work = sum(result.timings[name].duration for name in path)
+        waited = result.timings[path[-1]].end - result.timings[path[0]].ready - work
+        note = f", plus {waited:.1f}s waiting for inputs or resources" if waited >= 0.05 else ""
+        lines.append(f"Critical path ({work:.1f}s of work{note}): {' -> '.join(path)}")
+    return '\n'.join(lines)
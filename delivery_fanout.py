@@ -0,0 +1,212 @@
+# delivery_fanout.py
+
+"""
+Fan-out delivery of the translated summaries to Telegram.
+
+A routing table maps each language to its channels, and mirror chats get
+every language. Each chat becomes one job on a bounded asyncio queue served by
+a fixed pool of workers, so hundreds of chats go out in one pass while the
+shared TelegramDelivery engine keeps the bot within its flood limits. A chat's
+languages are sent in order by one worker, and a failing chat only affects its
+own entry in the delivery report.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from config import Config
+from markdown_ast import parse_markdown, render_telegram
+from telegram_delivery import DeliveryResult, TelegramDelivery, get_telegram_delivery, run_sync
+
+logger = logging.getLogger(__name__)
+
+
+def parse_routes(spec: str) -> Dict[str, List[str]]:
+    """Parse 'en:@market_en,-1001;hi:-1002' into {'en': ['@market_en', '-1001'], 'hi': ['-1002']}."""
+    routes: Dict[str, List[str]] = {}
+    for entry in (spec or '').split(';'):
+        if ':' not in entry:
+            continue
+        lang, chats = entry.split(':', 1)
+        chat_ids = [chat.strip() for chat in chats.split(',') if chat.strip()]
+        if lang.strip() and chat_ids:
+            routes.setdefault(lang.strip(), []).extend(chat_ids)
+    return routes
+
+
+def default_routes() -> Dict[str, List[str]]:
+    """Configured routes, or the English summary to the single TELEGRAM_CHAT_ID."""
+    return parse_routes(Config.TELEGRAM_ROUTES) or {'en': [Config.TELEGRAM_CHAT_ID]}
+
+
+@dataclass
+class ChatJob:
+    chat_id: str
+    messages: List[tuple] = field(default_factory=list)  # (language, telegram HTML) in send order
+
+
+@dataclass
+class ChatReport:
+    chat_id: str
+    languages: List[str]
+    ok: bool
+    attempts: int
+    latency_seconds: float
+    message_ids: List[int]
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+def build_jobs(translations: Dict[str, str], routes: Dict[str, List[str]],
+               mirrors: Iterable[str] = ()) -> List[ChatJob]:
+    """One job per chat, holding its routed languages in `translations` order."""
+    mirrors = [str(chat_id) for chat_id in mirrors]
+    jobs: Dict[str, ChatJob] = {}
+    for lang, text in translations.items():
+        if not text:
+            continue
+        html = render_telegram(parse_markdown(text))
+        for chat_id in dict.fromkeys([str(chat_id) for chat_id in routes.get(lang, [])] + mirrors):
+            jobs.setdefault(chat_id, ChatJob(chat_id)).messages.append((lang, html))
+    return list(jobs.values())
+
+
+def resolve_images(text: str) -> List[str]:
+    """Local paths of the summary's images: charts and cached files as-is, URLs through the shared image cache."""
+    from image_cache import get_image_fetcher, local_image_path
+
+    urls = list(dict.fromkeys(image.url for image in parse_markdown(text or '').images))
+    local = {url: url for url in urls if local_image_path(url)}
+    remote = [url for url in urls if url not in local and url.lower().startswith(('http://', 'https://'))]
+    if remote:
+        local.update(get_image_fetcher().fetch_many(remote))
+    return [local[url] for url in urls if local.get(url)]
+
+
+class FanOutDelivery:
+    """Delivers chat jobs through a bounded queue and a fixed number of workers."""
+
+    def __init__(self, delivery: TelegramDelivery = None, concurrency: int = None):
+        self.delivery = delivery or get_telegram_delivery()
+        self.concurrency = max(1, concurrency or Config.TELEGRAM_FANOUT_CONCURRENCY)
+
+    async def _deliver_chat(self, client, job: ChatJob, image_paths: Sequence[str]) -> ChatReport:
+        start = time.perf_counter()
+        results: Dict[str, DeliveryResult] = {}
+        for index, (lang, html) in enumerate(job.messages):
+            # A chat that gets several languages receives the images only once.
+            results[lang] = await self.delivery.deliver(client, job.chat_id, html, image_paths if index == 0 else ())
+        return ChatReport(
+            chat_id=job.chat_id,
+            languages=[lang for lang, _ in job.messages],
+            ok=all(result.ok for result in results.values()),
+            attempts=sum(result.attempts for result in results.values()),
+            latency_seconds=round(time.perf_counter() - start, 3),
+            message_ids=[message_id for result in results.values() for message_id in result.message_ids],
+            errors={lang: result.error for lang, result in results.items() if result.error},
+        )
+
+    async def run(self, jobs: List[ChatJob], image_paths: Sequence[str] = ()) -> List[ChatReport]:
+        reports: List[ChatReport] = []
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker(client):
+            while True:
+                job = await queue.get()
+                try:
+                    if job is None:
+                        return
+                    reports.append(await self._deliver_chat(client, job, image_paths))
+                except Exception as e:  # never let one chat take its worker down
+                    logger.error(f"Delivery to chat {job.chat_id} failed: {e}")
+                    reports.append(ChatReport(job.chat_id, [lang for lang, _ in job.messages], False, 0, 0.0, [],
+                                              {'*': str(e)}))
+                finally:
+                    queue.task_done()
+
+        async with self.delivery.client() as client:
+            pending = list(jobs)
+            if image_paths and pending:
+                # The first chat uploads the images; every other chat reuses the file_ids.
+                reports.append(await self._deliver_chat(client, pending.pop(0), image_paths))
+            workers = [asyncio.create_task(worker(client)) for _ in range(min(self.concurrency, len(pending)))]
+            for job in pending:
+                await queue.put(job)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        return reports
+
+    def deliver(self, translations: Dict[str, str], routes: Dict[str, List[str]] = None,
+                mirrors: Iterable[str] = None, image_paths: Sequence[str] = (),
+                skip_chats: Iterable[str] = ()) -> List[ChatReport]:
+        """
+        Blocking entry point: route every translation and deliver all chats concurrently.
+        `skip_chats` are left out, e.g. chats an earlier attempt already delivered to.
+        """
+        routes = default_routes() if routes is None else routes
+        mirrors = Config.TELEGRAM_MIRROR_CHATS if mirrors is None else mirrors
+        skip = {str(chat_id) for chat_id in skip_chats}
+        jobs = [job for job in build_jobs(translations, routes, mirrors) if job.chat_id not in skip]
+        if not jobs:
+            if skip:
+                logger.info("Every routed Telegram chat was already delivered; nothing to send")
+                return []
+            logger.warning("No Telegram chats are routed for the generated languages; nothing to send")
+            return []
+        start = time.perf_counter()
+        reports = run_sync(self.run(jobs, image_paths))
+        failed = [report.chat_id for report in reports if not report.ok]
+        logger.info(
+            f"Telegram fan-out: {len(reports) - len(failed)}/{len(reports)} chats delivered "
+            f"in {time.perf_counter() - start:.1f}s ({self.delivery.stats})"
+        )
+        if failed:
+            logger.warning(f"Telegram delivery failed for chats: {', '.join(failed)}")
+        return reports
+
+
+def delivered_chats(report: Optional[dict]) -> List[ChatReport]:
+    """The chats an earlier delivery report records as delivered."""
+    return [ChatReport(**chat) for chat in (report or {}).get('chats', []) if chat.get('ok')]
+
+
+def build_delivery_report(reports: List[ChatReport], translations: Dict[str, str],
+                          files_generated: List[str], elapsed_seconds: float,
+                          delivery: TelegramDelivery = None) -> dict:
+    """The demo's delivery_report fields plus one entry per chat and the engine's counters."""
+    delivered = sum(1 for report in reports if report.ok)
+    if reports and delivered == len(reports):
+        status, message = "delivered", f"Delivered to all {delivered} chats"
+    elif delivered:
+        status, message = "partial", f"Delivered to {delivered} of {len(reports)} chats"
+    else:
+        status, message = "failed", "No chat received the summary" if reports else "No chats routed"
+    english = translations.get('en') or next(iter(translations.values()), '')
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "status": status,
+        "files_generated": files_generated,
+        "languages": list(translations),
+        "word_count": len(english.split()),
+        "message": message,
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "telegram": dict((delivery or get_telegram_delivery()).stats),
+        "chats": [asdict(report) for report in reports],
+    }
+
+
+def write_delivery_report(report: dict, path: Optional[str] = None) -> str:
+    """Write the report as JSON atomically, so readers never see half a file."""
+    path = path or os.path.join(Config.OUTPUT_DIR, Config.DELIVERY_REPORT_FILENAME)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return path
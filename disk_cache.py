@@ -0,0 +1,158 @@
+# disk_cache.py
+
+"""
+Persistent key/value cache backed by a single SQLite file.
+
+Entries live in named namespaces, expire after a per-namespace TTL and are
+evicted least-recently-used first once a namespace grows past its size limit.
+Namespaces holding bulky responses can store their values zlib-compressed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    value       BLOB NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+
+class DiskCache:
+    """SQLite-backed cache with TTL expiry and size-bounded LRU eviction."""
+
+    def __init__(self, namespace: str, ttl_seconds: float, max_bytes: int, path: Optional[str] = None,
+                 compress: bool = False):
+        self.namespace = namespace
+        self.compress = compress
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.path = path or os.path.join(Config.CACHE_DIR, "cache.sqlite3")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Content-address a tuple of JSON-serialisable parts."""
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None when it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+        if self.compress:
+            value = zlib.decompress(value)
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        """Store `value` (JSON-serialisable) and evict old entries if the namespace is over budget."""
+        blob = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if self.compress:
+            blob = zlib.compress(blob, 6)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, blob, len(blob), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        """Remove `key` if present."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then least-recently-used ones until under `max_bytes`."""
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND created_at < ?",
+                (self.namespace, time.time() - self.ttl_seconds),
+            )
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed_at ASC", (self.namespace,)
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((self.namespace, key))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", evicted)
+        logger.debug(f"Evicted {len(evicted)} entries from cache namespace '{self.namespace}'")
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the namespace's current footprint."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
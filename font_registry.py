@@ -0,0 +1,168 @@
+# font_registry.py
+
+"""
+Process-wide font and paragraph style registry for PDF generation.
+
+TrueType fonts are parsed the first time a section in their script is laid
+out, not on every PDFGenerator construction, and each missing font is warned
+about once per process. The sample stylesheet and the per-language body styles
+are likewise built once and shared. ReportLab's TTFont already embeds only the
+glyphs a document uses, so a Devanagari summary carries a small font subset
+rather than the whole Noto file.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_COLOR = HexColor("#1a73e8")
+TEXT_COLOR = HexColor("#202124")
+GRAY_COLOR = HexColor("#5f6368")
+
+FALLBACK_FONT = 'Helvetica'
+
+# Language -> (font name, TTF file under Config.FONT_DIR, paragraph alignment)
+SCRIPT_FONTS: Dict[str, Tuple[str, str, int]] = {
+    'ar': ('NotoSansArabic', 'NotoSansArabic-Regular.ttf', TA_RIGHT),
+    'he': ('NotoSansHebrew', 'NotoSansHebrew-Regular.ttf', TA_RIGHT),
+    'hi': ('NotoSansDevanagari', 'NotoSansDevanagari-Regular.ttf', TA_LEFT),
+}
+
+
+class FontRegistry:
+    """Registers script fonts on first use and hands out shared paragraph styles."""
+
+    def __init__(self, font_dir: str = None):
+        self.font_dir = font_dir or Config.FONT_DIR
+        self.timings: Dict[str, float] = {}
+        self._fonts: Dict[str, str] = {}
+        self._styles: StyleSheet1 = None
+        self._lock = threading.RLock()
+
+    def font_for(self, lang: str) -> str:
+        """Font name for a language, registering its TTF on first use; Helvetica when unavailable."""
+        if lang not in SCRIPT_FONTS:
+            return FALLBACK_FONT
+        with self._lock:
+            if lang in self._fonts:
+                return self._fonts[lang]
+            name, filename, _ = SCRIPT_FONTS[lang]
+            path = os.path.join(self.font_dir, filename)
+            if name in pdfmetrics.getRegisteredFontNames():
+                self._fonts[lang] = name
+                return name
+            start = time.perf_counter()
+            try:
+                pdfmetrics.registerFont(TTFont(name, path))
+                self.timings[name] = time.perf_counter() - start
+                logger.info(f"Registered font {name} in {self.timings[name] * 1000:.0f}ms")
+                self._fonts[lang] = name
+            except Exception:
+                # Remembering the fallback means this is only logged once per process.
+                logger.warning(
+                    f"Font not found: {path}. "
+                    f"Please download it and place it in the '{os.path.dirname(path)}' directory "
+                    f"for proper {name.replace('NotoSans', '')} language support in the PDF."
+                )
+                self._fonts[lang] = FALLBACK_FONT
+            return self._fonts[lang]
+
+    def styles(self) -> StyleSheet1:
+        """The shared stylesheet with the title, header and base body styles."""
+        with self._lock:
+            if self._styles is None:
+                start = time.perf_counter()
+                styles = getSampleStyleSheet()
+                styles.add(ParagraphStyle(
+                    name='TitleStyle',
+                    fontName='Helvetica-Bold',
+                    fontSize=24,
+                    leading=28,
+                    textColor=PRIMARY_COLOR,
+                    alignment=TA_CENTER,
+                    spaceAfter=20
+                ))
+                styles.add(ParagraphStyle(
+                    name='LangHeaderStyle',
+                    fontName='Helvetica-Bold',
+                    fontSize=16,
+                    leading=20,
+                    textColor=TEXT_COLOR,
+                    spaceBefore=20,
+                    spaceAfter=10
+                ))
+                # Second-level and deeper markdown headings inside a section
+                styles.add(ParagraphStyle(
+                    name='SubHeaderStyle',
+                    fontName='Helvetica-Bold',
+                    fontSize=12,
+                    leading=16,
+                    textColor=TEXT_COLOR,
+                    spaceBefore=10,
+                    spaceAfter=6
+                ))
+                # Base body style for English
+                styles.add(ParagraphStyle(
+                    name='BodyStyle',
+                    fontName='Helvetica',
+                    fontSize=10,
+                    leading=14,
+                    textColor=GRAY_COLOR,
+                    spaceAfter=12
+                ))
+                self._styles = styles
+                self.timings['styles'] = time.perf_counter() - start
+            return self._styles
+
+    def body_style(self, lang: str) -> ParagraphStyle:
+        """Body style for a language, created (with its font) the first time it is needed."""
+        styles = self.styles()
+        if lang not in SCRIPT_FONTS:
+            return styles['BodyStyle']
+        style_name = f"BodyStyle_{lang}"
+        with self._lock:
+            if style_name not in styles:
+                _, _, alignment = SCRIPT_FONTS[lang]
+                styles.add(ParagraphStyle(
+                    name=style_name,
+                    parent=styles['BodyStyle'],
+                    fontName=self.font_for(lang),
+                    alignment=alignment
+                ))
+            return styles[style_name]
+
+    def heading_style(self, lang: str, level: int = 1) -> ParagraphStyle:
+        """Header style for a markdown heading; script languages keep their own font."""
+        base = self.styles()['LangHeaderStyle' if level <= 1 else 'SubHeaderStyle']
+        if lang not in SCRIPT_FONTS:
+            return base
+        style_name = f"{base.name}_{lang}"
+        with self._lock:
+            if style_name not in self._styles:
+                _, _, alignment = SCRIPT_FONTS[lang]
+                self._styles.add(ParagraphStyle(
+                    name=style_name,
+                    parent=base,
+                    fontName=self.font_for(lang),
+                    alignment=alignment
+                ))
+            return self._styles[style_name]
+
+    def stats(self) -> dict:
+        """Milliseconds spent per font registration and on the stylesheet."""
+        return {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+
+
+font_registry = FontRegistry()
@@ -0,0 +1,192 @@
+# image_cache.py
+
+"""
+Shared image download cache.
+
+Every image the pipeline needs (Tavily image search results, markdown images
+in the PDF) goes through one ImageFetcher:
+- downloads run concurrently over the shared HTTP session, and concurrent
+  requests for the same URL share one download;
+- files are stored once per content hash, with a URL -> hash index in the
+  disk cache, so the same picture behind two URLs is kept once;
+- resized copies are decoded and written once per size, then reused;
+- the directory is kept under a size limit, least recently used first.
+
+Image references come from LLM-written markdown, so a local path is only used
+as-is when it resolves inside a directory the pipeline writes images to (the
+chart directory or this cache); anything else is treated as a URL.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import Image
+
+from chart_renderer import CHART_DIR
+from config import Config
+from disk_cache import DiskCache
+from utils import get_http_session, prune_directory
+
+logger = logging.getLogger(__name__)
+
+# Some image hosts refuse requests without a browser-like user agent.
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
+}
+
+
+class ImageFetcher:
+    """Concurrent, content-addressed image downloads with a resized-copy cache."""
+
+    def __init__(self, root: str = None, max_bytes: int = None, index: DiskCache = None):
+        self.root = root or os.path.join(Config.CACHE_DIR, 'images')
+        self.thumb_root = os.path.join(self.root, 'thumbs')
+        self.max_bytes = max_bytes if max_bytes is not None else int(Config.IMAGE_CACHE_MAX_MB * 1024 * 1024)
+        self.index = index or DiskCache(
+            "image_urls",
+            ttl_seconds=Config.IMAGE_CACHE_TTL_DAYS * 86400,
+            max_bytes=1024 * 1024,
+        )
+        os.makedirs(self.thumb_root, exist_ok=True)
+        self.downloads = 0
+        self._executor = ThreadPoolExecutor(max_workers=Config.IMAGE_FETCH_CONCURRENCY,
+                                            thread_name_prefix="image-fetch")
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _original_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, f"{digest}.{ext}")
+
+    def _cached_path(self, url: str) -> Optional[str]:
+        entry = self.index.get(url)
+        if entry:
+            path = self._original_path(entry['digest'], entry['ext'])
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+        return None
+
+    def _download(self, url: str) -> Optional[str]:
+        path = self._cached_path(url)
+        if path:
+            return path
+        try:
+            response = get_http_session().get(url, timeout=10, headers=REQUEST_HEADERS)
+            response.raise_for_status()
+            content = response.content
+            with Image.open(BytesIO(content)) as img:
+                ext = (img.format or 'png').lower()
+        except Exception as e:
+            logger.error(f"Failed to download image from {url}: {e}")
+            return None
+
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._original_path(digest, ext)
+        if not os.path.exists(path):
+            temp_path = os.path.join(self.root, f".{digest}.{threading.get_ident()}.tmp")
+            with open(temp_path, 'wb') as handle:
+                handle.write(content)
+            os.replace(temp_path, path)
+        self.index.set(url, {'digest': digest, 'ext': ext})
+        self.downloads += 1
+        return path
+
+    def fetch_async(self, url: str) -> Future:
+        """Future for the local path of `url`; concurrent calls for one URL share a download."""
+        with self._lock:
+            future = self._in_flight.get(url)
+            if future is None:
+                future = self._executor.submit(self._download, url)
+                self._in_flight[url] = future
+                future.add_done_callback(lambda _, url=url: self._forget(url))
+            return future
+
+    def _forget(self, url: str):
+        with self._lock:
+            self._in_flight.pop(url, None)
+
+    def fetch(self, url: str) -> Optional[str]:
+        """Local path of the original image, downloading it if needed; None on failure."""
+        path = self._cached_path(url)
+        if path:
+            return path
+        path = self.fetch_async(url).result()
+        self.prune()
+        return path
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Download every URL concurrently; returns URL -> local path (None where it failed)."""
+        futures = {url: self.fetch_async(url) for url in dict.fromkeys(urls) if url}
+        paths = {url: future.result() for url, future in futures.items()}
+        self.prune()
+        return paths
+
+    def read_bytes(self, url: str) -> Optional[bytes]:
+        path = self.fetch(url)
+        if not path:
+            return None
+        with open(path, 'rb') as handle:
+            return handle.read()
+
+    def thumbnail(self, url: str, max_size: Tuple[int, int] = (800, 600)) -> Optional[str]:
+        """JPEG copy of the image fitted into `max_size`, decoded and resized only once per size."""
+        path = self.fetch(url)
+        if not path:
+            return None
+        digest = os.path.splitext(os.path.basename(path))[0]
+        thumb_path = os.path.join(self.thumb_root, f"{digest}_{max_size[0]}x{max_size[1]}.jpg")
+        if os.path.exists(thumb_path):
+            os.utime(thumb_path)
+            return thumb_path
+        try:
+            with Image.open(path) as img:
+                img = img.convert('RGB')
+                img.thumbnail(max_size, Image.Resampling.LANCZOS)
+                temp_path = os.path.join(self.thumb_root, f".{digest}.{threading.get_ident()}.tmp")
+                img.save(temp_path, 'JPEG', quality=85)
+            os.replace(temp_path, thumb_path)
+            return thumb_path
+        except Exception as e:
+            logger.error(f"Failed to resize image from {url}: {e}")
+            return None
+
+    def prune(self):
+        """Keep originals and resized copies under the size limit, least recently used first."""
+        prune_directory(self.root, self.max_bytes // 2, pattern='*.*')
+        prune_directory(self.thumb_root, self.max_bytes // 2, pattern='*.jpg')
+
+    def stats(self) -> dict:
+        return {'downloads': self.downloads, 'index': self.index.stats()}
+
+
+def local_image_path(url: str) -> Optional[str]:
+    """`url` if it is a file inside the chart directory or the image cache, else None."""
+    if not url or not os.path.isfile(url):
+        return None
+    path = os.path.realpath(url)
+    roots = [CHART_DIR, _image_fetcher.root if _image_fetcher else os.path.join(Config.CACHE_DIR, 'images')]
+    for root in roots:
+        root = os.path.realpath(root)
+        if os.path.commonpath([root, path]) == root:
+            return url
+    logger.warning(f"Ignoring local image outside the image directories: {url}")
+    return None
+
+
+_image_fetcher: Optional[ImageFetcher] = None
+_image_fetcher_lock = threading.Lock()
+
+
+def get_image_fetcher() -> ImageFetcher:
+    """The process-wide ImageFetcher, created on first use."""
+    global _image_fetcher
+    with _image_fetcher_lock:
+        if _image_fetcher is None:
+            _image_fetcher = ImageFetcher()
+        return _image_fetcher
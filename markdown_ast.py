@@ -0,0 +1,298 @@
+# markdown_ast.py
+
+"""
+Single-pass markdown parser shared by the PDF, Telegram and HTML outputs.
+
+The summaries written by the formatting task use headings of any level,
+`*`/`-`/`+` and numbered bullets, bold/italic/code spans, links and images.
+Each line is classified with one precompiled block pattern and its inline
+spans with one precompiled inline pattern, producing an immutable AST. Parsed
+documents are cached by content hash, so rendering the same translation to
+several outputs parses it once.
+"""
+
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+
+# ---------------- AST ---------------- #
+
+
+@dataclass(frozen=True)
+class Text:
+    text: str
+
+
+@dataclass(frozen=True)
+class Bold:
+    children: Tuple['Inline', ...]
+
+
+@dataclass(frozen=True)
+class Italic:
+    children: Tuple['Inline', ...]
+
+
+@dataclass(frozen=True)
+class Code:
+    text: str
+
+
+@dataclass(frozen=True)
+class Link:
+    children: Tuple['Inline', ...]
+    url: str
+
+
+Inline = Union[Text, Bold, Italic, Code, Link]
+
+
+@dataclass(frozen=True)
+class Heading:
+    level: int
+    children: Tuple[Inline, ...]
+
+
+@dataclass(frozen=True)
+class Paragraph:
+    children: Tuple[Inline, ...]
+
+
+@dataclass(frozen=True)
+class ListItem:
+    children: Tuple[Inline, ...]
+    number: int = 0  # 0 for bullets, otherwise the item number of an ordered list
+
+
+@dataclass(frozen=True)
+class ImageBlock:
+    alt: str
+    url: str
+
+
+@dataclass(frozen=True)
+class Rule:
+    pass
+
+
+Block = Union[Heading, Paragraph, ListItem, ImageBlock, Rule]
+
+
+@dataclass(frozen=True)
+class Document:
+    blocks: Tuple[Block, ...]
+
+    @property
+    def images(self) -> List[ImageBlock]:
+        return [block for block in self.blocks if isinstance(block, ImageBlock)]
+
+
+# ---------------- Tokenizer ---------------- #
+
+_BLOCK = re.compile(r"""
+    (?P<image>!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)(?:\s+"[^"]*")?\)\s*$)
+  | (?P<heading>(?P<hashes>\#{1,6})\s+(?P<heading_text>.*?)[\s\#]*$)
+  | (?P<rule>(?:-\s*){3,}$|(?:\*\s*){3,}$|(?:_\s*){3,}$)
+  | (?P<bullet>[-*+•]\s+(?P<bullet_text>.*)$)
+  | (?P<ordered>(?P<number>\d{1,9})[.)]\s+(?P<ordered_text>.*)$)
+""", re.VERBOSE)
+
+_INLINE = re.compile(r"""
+    `(?P<code>[^`]+)`
+  | \*\*(?P<bold>(?=\S).+?(?<=\S))\*\*
+  | __(?P<bold_alt>(?=\S).+?(?<=\S))__
+  | \*(?P<italic>(?=[^\s*])[^*]*?(?<=[^\s*]))\*
+  | (?<!\w)_(?P<italic_alt>(?=[^\s_])[^_]*?(?<=[^\s_]))_(?!\w)
+  | !?\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)
+""", re.VERBOSE)
+
+
+def parse_inline(text: str) -> Tuple[Inline, ...]:
+    """Split a line into inline nodes; nested spans (e.g. a link inside bold) are parsed recursively."""
+    nodes: List[Inline] = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            nodes.append(Text(text[position:match.start()]))
+        kind = match.lastgroup
+        if kind == 'code':
+            nodes.append(Code(match.group('code')))
+        elif kind in ('bold', 'bold_alt'):
+            nodes.append(Bold(parse_inline(match.group(kind))))
+        elif kind in ('italic', 'italic_alt'):
+            nodes.append(Italic(parse_inline(match.group(kind))))
+        else:
+            nodes.append(Link(parse_inline(match.group('link_text')), match.group('link_url')))
+        position = match.end()
+    if position < len(text):
+        nodes.append(Text(text[position:]))
+    return tuple(nodes)
+
+
+def _parse(text: str) -> Document:
+    blocks: List[Block] = []
+    paragraph: List[str] = []
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(Paragraph(parse_inline(' '.join(paragraph))))
+            paragraph.clear()
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            flush_paragraph()
+            continue
+        match = _BLOCK.match(line)
+        if match is None:
+            # Consecutive plain lines form one paragraph, as in markdown.
+            paragraph.append(line)
+            continue
+        flush_paragraph()
+        kind = match.lastgroup  # the outer group of whichever alternative matched
+        if kind == 'image':
+            blocks.append(ImageBlock(match.group('alt'), match.group('src')))
+        elif kind == 'heading':
+            children = parse_inline(match.group('heading_text'))
+            if len(children) == 1 and isinstance(children[0], Bold):
+                children = children[0].children  # "## **Title**": headings are bold already
+            blocks.append(Heading(len(match.group('hashes')), children))
+        elif kind == 'rule':
+            blocks.append(Rule())
+        elif kind == 'bullet':
+            blocks.append(ListItem(parse_inline(match.group('bullet_text'))))
+        else:
+            blocks.append(ListItem(parse_inline(match.group('ordered_text')), int(match.group('number'))))
+    flush_paragraph()
+    return Document(tuple(blocks))
+
+
+# ---------------- AST cache ---------------- #
+
+AST_CACHE_SIZE = 256
+
+_ast_cache: 'OrderedDict[str, Document]' = OrderedDict()
+_ast_cache_lock = threading.Lock()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def parse_markdown(text: str) -> Document:
+    """Parse markdown into a Document, reusing the cached AST for identical content."""
+    key = content_hash(text or '')
+    with _ast_cache_lock:
+        document = _ast_cache.get(key)
+        if document is not None:
+            _ast_cache.move_to_end(key)
+            return document
+    document = _parse(text or '')
+    with _ast_cache_lock:
+        _ast_cache[key] = document
+        while len(_ast_cache) > AST_CACHE_SIZE:
+            _ast_cache.popitem(last=False)
+    return document
+
+
+def clear_ast_cache():
+    with _ast_cache_lock:
+        _ast_cache.clear()
+
+
+# ---------------- Renderers ---------------- #
+
+def plain_text(nodes: Tuple[Inline, ...]) -> str:
+    """Inline nodes without any markup."""
+    parts = []
+    for node in nodes:
+        if isinstance(node, (Text, Code)):
+            parts.append(node.text)
+        else:
+            parts.append(plain_text(node.children))
+    return ''.join(parts)
+
+
+def render_inline_html(nodes: Tuple[Inline, ...], code_markup: Tuple[str, str] = ('<code>', '</code>')) -> str:
+    """HTML-style inline markup; shared by HTML, Telegram (HTML parse mode) and ReportLab paragraphs."""
+    parts = []
+    for node in nodes:
+        if isinstance(node, Text):
+            parts.append(html.escape(node.text, quote=False))
+        elif isinstance(node, Code):
+            parts.append(f"{code_markup[0]}{html.escape(node.text, quote=False)}{code_markup[1]}")
+        elif isinstance(node, Bold):
+            parts.append(f"<b>{render_inline_html(node.children, code_markup)}</b>")
+        elif isinstance(node, Italic):
+            parts.append(f"<i>{render_inline_html(node.children, code_markup)}</i>")
+        else:
+            parts.append(f'<a href="{html.escape(node.url)}">{render_inline_html(node.children, code_markup)}</a>')
+    return ''.join(parts)
+
+
+def render_html(document: Document) -> str:
+    """Standalone HTML fragment; consecutive list items are grouped into <ul>/<ol>."""
+    out = []
+    open_list = None
+    for block in document.blocks:
+        list_tag = ('ol' if block.number else 'ul') if isinstance(block, ListItem) else None
+        if open_list and open_list != list_tag:
+            out.append(f"</{open_list}>")
+            open_list = None
+        if list_tag and open_list is None:
+            out.append(f"<{list_tag}>")
+            open_list = list_tag
+
+        if isinstance(block, Heading):
+            out.append(f"<h{block.level}>{render_inline_html(block.children)}</h{block.level}>")
+        elif isinstance(block, Paragraph):
+            out.append(f"<p>{render_inline_html(block.children)}</p>")
+        elif isinstance(block, ListItem):
+            out.append(f"<li>{render_inline_html(block.children)}</li>")
+        elif isinstance(block, ImageBlock):
+            out.append(f'<img src="{html.escape(block.url)}" alt="{html.escape(block.alt)}">')
+        elif isinstance(block, Rule):
+            out.append("<hr>")
+    if open_list:
+        out.append(f"</{open_list}>")
+    return '\n'.join(out)
+
+
+def render_telegram(document: Document) -> str:
+    """
+    Text for Telegram's HTML parse mode, which has no headings or lists:
+    headings become bold lines and list items get bullet or number prefixes.
+    Blocks are separated by a blank line, except a heading's first block and
+    consecutive list items, so split_message can cut at paragraph boundaries.
+    Images are left out; send them with document.images.
+    """
+    out = []
+    previous = None
+    for block in document.blocks:
+        if isinstance(block, Heading):
+            line = f"<b>{render_inline_html(block.children)}</b>"
+        elif isinstance(block, Paragraph):
+            line = render_inline_html(block.children)
+        elif isinstance(block, ListItem):
+            marker = f"{block.number}." if block.number else "•"
+            line = f"{marker} {render_inline_html(block.children)}"
+        elif isinstance(block, Rule):
+            line = "———"
+        else:
+            continue
+        joined = isinstance(previous, Heading) and not isinstance(block, (Heading, Rule)) \
+            or isinstance(previous, ListItem) and isinstance(block, ListItem)
+        if out and not joined:
+            out.append('')
+        out.append(line)
+        previous = block
+    return '\n'.join(out).strip()
+
+
+def render_reportlab(nodes: Tuple[Inline, ...]) -> str:
+    """ReportLab paragraph markup (a subset of HTML) for inline nodes."""
+    return render_inline_html(nodes, code_markup=('<font face="Courier">', '</font>'))
@@ -0,0 +1,212 @@
+# market_analytics.py
+
+"""
+Vectorised market analytics for the summary stage.
+
+Every metric is computed for the whole universe at once on the (time x symbol)
+close/open matrices of a provider frame: multi-horizon returns, realised
+volatility, 20/50-day moving-average crossovers, opening gaps, breadth and
+sector aggregates. The result renders as a compact fact table that is handed
+to the summary agent, so it does not have to dig numbers out of news text.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RETURN_HORIZONS = {'1d': 1, '5d': 5, '1m': 21}
+VOLATILITY_WINDOW = 21
+FAST_MA = 20
+SLOW_MA = 50
+GAP_THRESHOLD = 0.02
+TRADING_DAYS = 252
+TOP_N = 5
+
+# Sector of each default watchlist symbol; anything else is grouped as 'Other'.
+SECTOR_MAP = {
+    'SPY': 'Index', 'QQQ': 'Index', 'DIA': 'Index', 'IWM': 'Index',
+    'AAPL': 'Technology', 'MSFT': 'Technology', 'NVDA': 'Technology', 'AVGO': 'Technology',
+    'GOOGL': 'Communication', 'META': 'Communication', 'NFLX': 'Communication',
+    'AMZN': 'Consumer', 'TSLA': 'Consumer', 'WMT': 'Consumer', 'COST': 'Consumer',
+    'JPM': 'Financials', 'BAC': 'Financials', 'GS': 'Financials', 'V': 'Financials',
+    'XOM': 'Energy', 'CVX': 'Energy',
+    'UNH': 'Health Care', 'JNJ': 'Health Care', 'LLY': 'Health Care',
+    'CAT': 'Industrials', 'BA': 'Industrials',
+}
+
+
+@dataclass
+class MarketFacts:
+    as_of: Optional[pd.Timestamp]
+    metrics: pd.DataFrame  # one row per symbol
+    breadth: Dict[str, float]
+    sectors: pd.DataFrame  # one row per sector
+    compute_seconds: float
+
+    @property
+    def is_current(self) -> bool:
+        """Whether the last bar is from the current (or, on a weekend, the last) trading session."""
+        if self.as_of is None:
+            return False
+        session = pd.offsets.BDay().rollback(pd.Timestamp.today().normalize())
+        return self.as_of.normalize() >= session
+
+    def to_prompt(self, top_n: int = TOP_N) -> str:
+        """Compact plain-text fact table for the summary prompt."""
+        if self.metrics.empty:
+            return ""
+        metrics = self.metrics
+        as_of = self.as_of.date() if self.as_of is not None else 'unknown'
+        lines = [f"Market facts for {len(metrics)} symbols, last bar {as_of} (returns in %):"]
+        if not self.is_current:
+            lines.append(f"- Stale data: no bars from the current session; these figures are as of {as_of}")
+
+        breadth = self.breadth
+        above = breadth['above_slow_ma_pct']
+        trend = (f"{above:.0f}% above the {SLOW_MA}-day average" if not np.isnan(above)
+                 else f"not enough history for the {SLOW_MA}-day average")
+        lines.append(
+            f"- Breadth: {breadth['advancers']} advancers, {breadth['decliners']} decliners, "
+            f"{breadth['unchanged']} unchanged; {trend}"
+        )
+        if len(self.sectors) > 1:
+            sector_text = ', '.join(
+                f"{sector} {row['return_1d']:+.2f} (5d {row['return_5d']:+.2f})"
+                for sector, row in self.sectors.iterrows()
+            )
+            lines.append(f"- Sectors, 1d average: {sector_text}")
+
+        ranked = metrics.dropna(subset=['return_1d']).sort_values('return_1d')
+        if not ranked.empty:
+            lines.append(f"- Top gainers: {self._movers(ranked.iloc[::-1].head(top_n))}")
+            lines.append(f"- Top decliners: {self._movers(ranked.head(top_n))}")
+
+        gaps_up = metrics[metrics['gap'] >= GAP_THRESHOLD].sort_values('gap', ascending=False).head(top_n)
+        gaps_down = metrics[metrics['gap'] <= -GAP_THRESHOLD].sort_values('gap').head(top_n)
+        if len(gaps_up) or len(gaps_down):
+            gap_text = ', '.join(f"{symbol} {gap * 100:+.1f}" for symbol, gap in pd.concat([gaps_up, gaps_down])['gap'].items())
+            lines.append(f"- Opening gaps beyond {GAP_THRESHOLD * 100:.0f}%: {gap_text}")
+
+        golden = metrics.index[metrics['ma_cross'] == 1].tolist()[:top_n]
+        death = metrics.index[metrics['ma_cross'] == -1].tolist()[:top_n]
+        if golden or death:
+            lines.append(
+                f"- {FAST_MA}/{SLOW_MA}-day average crosses: up {', '.join(golden) or 'none'}; "
+                f"down {', '.join(death) or 'none'}"
+            )
+
+        volatile = metrics.dropna(subset=['volatility']).sort_values('volatility', ascending=False).head(top_n)
+        if not volatile.empty:
+            lines.append(
+                "- Highest annualised volatility: "
+                + ', '.join(f"{symbol} {value * 100:.0f}%" for symbol, value in volatile['volatility'].items())
+            )
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _movers(rows: pd.DataFrame) -> str:
+        return ', '.join(
+            f"{symbol} {row['return_1d']:+.2f} (5d {row['return_5d']:+.2f}, 1m {row['return_1m']:+.2f})"
+            for symbol, row in rows.iterrows()
+        )
+
+
+def _trailing_mean(values: np.ndarray, window: int, offset: int = 0) -> np.ndarray:
+    """Mean of the last `window` rows ending `offset` rows before the end; NaN without a full window."""
+    end = values.shape[0] - offset
+    if end < window:
+        return np.full(values.shape[1], np.nan)
+    with np.errstate(invalid='ignore'):
+        block = values[end - window:end]
+        return np.where(np.isnan(block).any(axis=0), np.nan, np.nanmean(block, axis=0))
+
+
+def compute_analytics(frame: pd.DataFrame, symbols: Optional[List[str]] = None,
+                      sectors: Optional[Dict[str, str]] = None) -> MarketFacts:
+    """All metrics for every symbol of a (field, symbol) provider frame in one vectorised pass."""
+    start = time.perf_counter()
+    sectors = SECTOR_MAP if sectors is None else sectors
+    if frame is None or frame.empty:
+        empty = pd.DataFrame()
+        return MarketFacts(None, empty, {}, empty, time.perf_counter() - start)
+    symbols = symbols or list(frame['Close'].columns)
+
+    # Carry the last close over missing bars so every symbol lines up on the shared calendar.
+    close_frame = frame['Close'].reindex(columns=symbols).ffill()
+    close_frame = close_frame.loc[:, close_frame.notna().any()]
+    symbols = list(close_frame.columns)
+    close = close_frame.to_numpy(dtype=float)
+    opens = frame['Open'].reindex(columns=symbols).to_numpy(dtype=float)
+    rows = close.shape[0]
+    last = close[-1]
+
+    metrics = {'close': last}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for label, horizon in RETURN_HORIZONS.items():
+            base = close[-1 - horizon] if rows > horizon else np.full(len(symbols), np.nan)
+            metrics[f'return_{label}'] = (last / base - 1) * 100
+
+        log_returns = np.diff(np.log(close[-VOLATILITY_WINDOW - 1:]), axis=0)
+        if log_returns.shape[0] >= 2:
+            metrics['volatility'] = np.nanstd(log_returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+        else:
+            metrics['volatility'] = np.full(len(symbols), np.nan)
+
+        fast, slow = _trailing_mean(close, FAST_MA), _trailing_mean(close, SLOW_MA)
+        fast_prev, slow_prev = _trailing_mean(close, FAST_MA, 1), _trailing_mean(close, SLOW_MA, 1)
+        above_now = np.sign(fast - slow)
+        above_before = np.sign(fast_prev - slow_prev)
+        metrics['ma_cross'] = np.where(
+            (above_now > 0) & (above_before <= 0), 1, np.where((above_now < 0) & (above_before >= 0), -1, 0)
+        )
+        # NaN where the slow average has too little history, so those symbols count as neither
+        metrics['above_slow_ma'] = np.where(np.isnan(slow), np.nan, last > slow)
+
+        metrics['gap'] = opens[-1] / close[-2] - 1 if rows > 1 else np.full(len(symbols), np.nan)
+
+    table = pd.DataFrame(metrics, index=pd.Index(symbols, name='symbol'))
+    table['sector'] = [sectors.get(symbol, 'Other') for symbol in symbols]
+
+    daily = table['return_1d'].to_numpy()
+    valid = ~np.isnan(daily)
+    breadth = {
+        'advancers': int((daily[valid] > 0).sum()),
+        'decliners': int((daily[valid] < 0).sum()),
+        'unchanged': int((daily[valid] == 0).sum()),
+        # mean() skips the NaN rows of symbols without a slow average
+        'above_slow_ma_pct': float(table['above_slow_ma'].mean() * 100),
+    }
+    sector_table = table.groupby('sector').agg(
+        symbols=('close', 'size'),
+        return_1d=('return_1d', 'mean'),
+        return_5d=('return_5d', 'mean'),
+        advancers=('return_1d', lambda values: int((values > 0).sum())),
+    ).sort_values('return_1d', ascending=False)
+
+    as_of = close_frame.index[-1] if len(close_frame.index) else None
+    return MarketFacts(pd.Timestamp(as_of) if as_of is not None else None, table, breadth, sector_table,
+                       time.perf_counter() - start)
+
+
+def collect_market_facts(symbols: Optional[List[str]] = None, period: Optional[str] = None) -> Optional[MarketFacts]:
+    """Fetch the watchlist through the configured provider and compute its facts; None if the fetch fails."""
+    from market_data import get_provider
+
+    symbols = symbols or Config.MARKET_WATCHLIST
+    period = period or Config.MARKET_ANALYTICS_PERIOD
+    try:
+        frame = get_provider().fetch(symbols, period)
+    except Exception as e:
+        logger.warning(f"Market analytics skipped, data fetch failed: {e}")
+        return None
+    facts = compute_analytics(frame, symbols)
+    logger.info(f"Market analytics: {len(facts.metrics)} symbols in {facts.compute_seconds * 1000:.1f}ms")
+    return facts
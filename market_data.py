@@ -0,0 +1,214 @@
+# market_data.py
+
+"""
+Batched market data access for MarketDataTool.
+
+Providers return daily OHLCV bars for many symbols in one request as a wide
+DataFrame (columns are a (field, symbol) MultiIndex). Quote figures for every
+symbol are then computed at once with column-wise NumPy operations.
+
+With MARKET_DATA_STORE enabled the provider is wrapped in a local OHLCV store
+(see ohlcv_store.py), so only bars after the last stored one are downloaded.
+"""
+
+import logging
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+OHLCV_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Approximate trading bars per yfinance period string
+PERIOD_BARS = {'1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504, '5y': 1260}
+
+
+def period_bars(period: str) -> int:
+    return PERIOD_BARS.get(period, 21)
+
+
+class MarketDataProvider:
+    """Source of OHLCV bars for many symbols in one request."""
+
+    name = "base"
+
+    def fetch(self, symbols: List[str], period: str = "1d", start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Return bars for `symbols` with (field, symbol) MultiIndex columns.
+        When `start` is given, bars from that date onwards are returned instead of `period`.
+        """
+        raise NotImplementedError
+
+
+def _as_wide_frame(frame: pd.DataFrame, symbols: List[str]) -> pd.DataFrame:
+    """Normalise a provider frame to (field, symbol) columns, including single-symbol downloads."""
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=pd.MultiIndex.from_product([OHLCV_FIELDS, symbols]))
+    if not isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.copy()
+        frame.columns = pd.MultiIndex.from_product([frame.columns, symbols[:1]])
+    return frame
+
+
+class YFinanceProvider(MarketDataProvider):
+    """All symbols in one yfinance multi-ticker download."""
+
+    name = "yfinance"
+
+    def fetch(self, symbols: List[str], period: str = "1d", start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        import yfinance as yf
+
+        window = {'start': pd.Timestamp(start).date()} if start is not None else {'period': period}
+        frame = yf.download(
+            symbols,
+            **window,
+            group_by='column',
+            auto_adjust=True,
+            threads=True,
+            progress=False,
+        )
+        return _as_wide_frame(frame, symbols)
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Deterministic random-walk bars with a fixed per-request latency plus an
+    optional per-bar transfer cost. Stands in for a real provider in benchmarks
+    and offline runs. Every walk starts at ORIGIN, so a bar has the same values
+    whatever window it is fetched in and whatever `end` the provider was created with.
+    """
+
+    name = "synthetic"
+    PERIOD_BARS = PERIOD_BARS
+    ORIGIN = pd.Timestamp('2015-01-01')
+
+    def __init__(self, latency: float = 0.0, seed: int = 42, end: Optional[pd.Timestamp] = None,
+                 bar_latency: float = 0.0):
+        self.latency = latency
+        self.bar_latency = bar_latency
+        self.seed = seed
+        self.end = end or pd.Timestamp.now().normalize()
+        self.requests = 0
+        self.bars_served = 0
+
+    def bars(self, symbols: List[str], bar_count: int, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        history = pd.bdate_range(start=self.ORIGIN, end=self.end)
+        if start is not None:
+            first = int(history.searchsorted(pd.Timestamp(start)))
+        else:
+            first = max(len(history) - bar_count, 0)
+        index = history[first:]
+        fields = {}
+        columns = []
+        for symbol in symbols:
+            symbol_seed = zlib.crc32(symbol.encode('utf-8'))
+            rng = np.random.default_rng([self.seed, symbol_seed])
+            size = len(history)
+            walk = rng.normal(0.0004, 0.015, size=size).cumsum()
+            close = (50 + symbol_seed % 450) * np.exp(walk)
+            open_ = close * (1 + rng.normal(0, 0.004, size=size))
+            high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, size=size)))
+            low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, size=size)))
+            volume = rng.integers(1_000_000, 50_000_000, size=size).astype(float)
+            fields[('Open', symbol)] = open_[first:]
+            fields[('High', symbol)] = high[first:]
+            fields[('Low', symbol)] = low[first:]
+            fields[('Close', symbol)] = close[first:]
+            fields[('Volume', symbol)] = volume[first:]
+            columns.append(symbol)
+        frame = pd.DataFrame(fields, index=index)
+        self.bars_served += len(index) * len(columns)
+        return frame.reindex(columns=pd.MultiIndex.from_product([OHLCV_FIELDS, columns]))
+
+    def fetch(self, symbols: List[str], period: str = "1d", start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        self.requests += 1
+        served = self.bars_served
+        frame = self.bars(symbols, period_bars(period), start=start)
+        delay = self.latency + self.bar_latency * (self.bars_served - served)
+        if delay:
+            time.sleep(delay)
+        return frame
+
+
+PROVIDERS = {
+    YFinanceProvider.name: YFinanceProvider,
+    SyntheticProvider.name: SyntheticProvider,
+}
+
+_provider: Optional[MarketDataProvider] = None
+
+
+def get_provider() -> MarketDataProvider:
+    """
+    The process-wide provider selected by Config.MARKET_DATA_PROVIDER, behind the
+    local OHLCV store when Config.MARKET_DATA_STORE is on. The 'store' provider
+    reads the local store only, e.g. one loaded from fixtures for offline runs.
+    """
+    global _provider
+    if _provider is None:
+        from ohlcv_store import StoreBackedProvider
+
+        if Config.MARKET_DATA_PROVIDER == StoreBackedProvider.name:
+            _provider = StoreBackedProvider(upstream=None)
+        elif Config.MARKET_DATA_STORE:
+            _provider = StoreBackedProvider(upstream=PROVIDERS[Config.MARKET_DATA_PROVIDER]())
+        else:
+            _provider = PROVIDERS[Config.MARKET_DATA_PROVIDER]()
+    return _provider
+
+
+def set_provider(provider: MarketDataProvider):
+    """Swap the provider, e.g. for benchmarks or offline runs."""
+    global _provider
+    _provider = provider
+
+
+def _last_valid_positions(mask: np.ndarray) -> np.ndarray:
+    positions = np.where(mask, np.arange(mask.shape[0])[:, None], -1)
+    return positions.max(axis=0)
+
+
+def summarize_quotes(frame: pd.DataFrame, symbols: List[str]) -> Dict[str, dict]:
+    """
+    Price, change, change % and volume for every symbol in one vectorised pass.
+    Symbols without any bars are left out, as the per-symbol path did.
+    """
+    if frame.empty:
+        return {}
+    close = frame['Close'].reindex(columns=symbols)
+    volume = frame['Volume'].reindex(columns=symbols) if 'Volume' in frame.columns.get_level_values(0) else None
+    values = close.to_numpy(dtype=float)
+    mask = ~np.isnan(values)
+    columns = np.arange(values.shape[1])
+
+    last = _last_valid_positions(mask)
+    previous_mask = mask.copy()
+    previous_mask[last.clip(min=0), columns] = False
+    previous = _last_valid_positions(previous_mask)
+
+    current_price = values[last.clip(min=0), columns]
+    prev_close = np.where(previous >= 0, values[previous.clip(min=0), columns], current_price)
+    change = current_price - prev_close
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_pct = np.where(prev_close != 0, change / prev_close * 100, 0.0)
+    if volume is not None:
+        last_volume = np.nan_to_num(volume.to_numpy(dtype=float)[last.clip(min=0), columns]).astype(np.int64)
+    else:
+        last_volume = np.zeros(len(symbols), dtype=np.int64)
+
+    quotes = {}
+    for i, symbol in enumerate(symbols):
+        if last[i] < 0:
+            continue
+        quotes[symbol] = {
+            'current_price': round(float(current_price[i]), 2),
+            'change': round(float(change[i]), 2),
+            'change_percent': round(float(change_pct[i]), 2),
+            'volume': int(last_volume[i]),
+        }
+    return quotes
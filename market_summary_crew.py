@@ -1,29 +1,52 @@
 # market_summary_crew.py (FINAL, FINAL VERSION)
 
 import os
+import json
 import logging
 import time
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 
 from crewai import Crew, Task
 from agents import MarketAgents
-from tasks import MarketTasks
-from tools import tavily_search_tool, market_data_tool, image_search_tool, telegram_send_tool, BASETOOL_AVAILABLE
+from tasks import MarketTasks, parse_batch_translation, parse_segment_translation
+from tools import search_cache_stats, tavily_search_tool, market_data_tool, image_search_tool, telegram_send_tool, BASETOOL_AVAILABLE
 from pdf_generator import PDFGenerator
+from disk_cache import DiskCache
+from news_dedup import dedupe_articles
+from context_compressor import compress_context
+from market_analytics import MarketFacts, collect_market_facts
+from checkpoint import CheckpointStore, prune_runs
+from dag import DAGExecutor, Node
+from delivery_fanout import (FanOutDelivery, build_delivery_report, delivered_chats, resolve_images,
+                             write_delivery_report)
+from translation_memory import TranslationMemory, segment_markdown
 from config import Config
 from utils import setup_logging
+from rate_limiter import rate_limiter, install_litellm_hooks
 
 logger = setup_logging()
 
+# Fixed pause the workflow used to sleep between stages; kept only to report the time saved.
+LEGACY_STAGE_PAUSE_SECONDS = 25
+
 class MarketSummaryCrew:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
         Config.validate()
         if not os.getenv("GROQ_API_KEY"):
             os.environ["GROQ_API_KEY"] = Config.GROQ_API_KEY
+        install_litellm_hooks(rate_limiter)
 
         self.agents = MarketAgents()
         self.tasks = MarketTasks()
         self.pdf_generator = PDFGenerator()
+        self.llm_cache = DiskCache(
+            "llm",
+            ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+            max_bytes=int(Config.LLM_CACHE_MAX_MB * 1024 * 1024),
+        ) if use_cache else None
+        self.translation_memory = TranslationMemory() if Config.TRANSLATION_MEMORY_ENABLED else None
+        self.checkpoints: Optional[CheckpointStore] = None
         os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
 
         self.search_agent = self.agents.create_search_agent()
@@ -40,65 +63,314 @@ class MarketSummaryCrew:
             logger.warning("crewai_tools.BaseTool not available; skipping tool attachment.")
         logger.info("Market Summary Crew initialized successfully")
 
-    def run_daily_summary(self):
+    def run_daily_summary(self, resume: Optional[str] = None):
         """
-        Runs the workflow by executing tasks MANUALLY with delays.
-        This is the key fix to avoid rate limiting.
+        Runs the workflow as a DAG of stages (see build_stages): each stage
+        starts once its inputs are ready, within the LLM/HTTP/CPU concurrency
+        limits. Every LLM call goes through the shared rate limiter, which only
+        waits when the provider quota is actually tight. Each stage's output is
+        checkpointed, so `resume` (a run id, or 'latest') skips finished stages.
         """
         try:
-            logger.info("Starting manual task execution to avoid rate limits.")
+            self.checkpoints = CheckpointStore(resume)
+            logger.info(
+                f"{'Resuming' if self.checkpoints.resumed else 'Starting'} run {self.checkpoints.run_id} "
+                f"under the shared rate limiter."
+            )
+            if self.checkpoints.resumed:
+                logger.info(f"Completed stages: {', '.join(self.checkpoints.completed()) or 'none'}")
+            else:
+                prune_runs()
+            rate_limiter.reset_stats()
+
+            languages = [lang.strip() for lang in Config.TRANSLATION_LANGUAGES if lang.strip()]
+            limits = {
+                'llm': Config.DAG_LLM_CONCURRENCY,
+                'http': Config.DAG_HTTP_CONCURRENCY,
+                'cpu': Config.DAG_CPU_CONCURRENCY or os.cpu_count() or 1,
+            }
+            results = DAGExecutor(self.build_stages(languages), limits, self.checkpoints).run().results
+
+            self._log_translation_usage(languages)
+            if self.translation_memory is not None:
+                self.translation_memory.log_stats()
+            rate_limiter.log_report(
+                fixed_pause_seconds=LEGACY_STAGE_PAUSE_SECONDS * (2 + len(languages))
+            )
+
+            translations = self._collect_translations(results['format'], languages, results)
+            final_output = "\n\n---\n\n".join([f"Language: {lang}\n\n{text}" for lang, text in translations.items()])
+            if (results.get('send') or {}).get('status') == 'partial':
+                logger.warning(f"Daily market summary workflow finished with partial delivery; resume with: "
+                               f"python run_market_summary.py --resume {self.checkpoints.run_id}")
+            else:
+                self.checkpoints.mark_finished()
+                logger.info(f"Daily market summary workflow finished successfully (run {self.checkpoints.run_id}).")
+            return final_output
+
+        except Exception as e:
+            run_id = self.checkpoints.run_id if self.checkpoints else None
+            logger.error(f"Error in daily summary workflow: {e}")
+            if run_id:
+                logger.error(f"Completed stages are checkpointed; resume with: python run_market_summary.py --resume {run_id}")
+            raise
+
+    def build_stages(self, languages: List[str]) -> List[Node]:
+        """
+        The pipeline as DAG nodes. Market data is fetched while the news is
+        searched, and the summary's images download while it is translated.
+        """
+        translate_nodes = ['translate'] if Config.TRANSLATION_MODE == "batched" and len(languages) > 1 \
+            else [f"translate_{lang}" for lang in languages]
+        nodes = [
+            Node("news", lambda: self.collect_news(), resource='http', checkpoint=False),
+            Node("search", lambda news: self.run_search(news), deps=["news"], resource='llm'),
+            Node("market_facts", lambda: self.collect_facts(), resource='http', optional=True, checkpoint=False),
+            Node("summary", lambda search, market_facts: self.run_summary(search, market_facts),
+                 deps=["search", "market_facts"], resource='llm'),
+            Node("format", lambda summary: self.run_format(summary), deps=["summary"], resource='llm'),
+            Node("images", lambda format: resolve_images(format), deps=["format"], resource='http',
+                 optional=True, checkpoint=False),
+        ]
+        if translate_nodes == ['translate']:
+            # translate_all checkpoints each language itself and retries what the batch missed.
+            nodes.append(Node("translate", lambda format: self.translate_all(format, languages, log_usage=False),
+                              deps=["format"], resource='llm', checkpoint=False))
+        else:
+            nodes.extend(
+                Node(f"translate_{lang}", lambda format, lang=lang: self._translate_one(lang, format),
+                     deps=["format"], resource='llm', optional=True)
+                for lang in languages
+            )
+
+        def pdf(format, images, **translated):
+            return self.generate_pdf_output(self._collect_translations(format, languages, translated))
+
+        def send(format, images, pdf, **translated):
+            translations = self._collect_translations(format, languages, translated)
+            # A resumed run retries only the chats the checkpointed report did not reach.
+            previous = self.checkpoints.load("send") if self.checkpoints and self.checkpoints.has("send") else None
+            return self.deliver_output(translations, [pdf] if pdf else [], image_paths=images or [],
+                                       previous=previous)
+
+        nodes.append(Node("pdf", pdf, deps=["format", "images"] + translate_nodes, resource='cpu',
+                          valid=lambda path: bool(path) and os.path.exists(path)))
+        nodes.append(Node("send", send, deps=["format", "images", "pdf"] + translate_nodes, resource='http',
+                          valid=lambda report: bool(report) and report.get('status') == 'delivered'))
+        return nodes
+
+    @staticmethod
+    def _collect_translations(formatted: str, languages: List[str], results: Dict) -> Dict[str, str]:
+        """English plus every language that translated, in configured order."""
+        translations = {'en': formatted}
+        translated = dict(results.get('translate') or {})
+        translated.update({lang: results[f"translate_{lang}"] for lang in languages
+                           if results.get(f"translate_{lang}")})
+        translations.update({lang: translated[lang] for lang in languages if translated.get(lang)})
+        return translations
 
-            # --- Step 1: Search ---
-            logger.info("Executing Search Task...")
+    def run_search(self, news: List[dict]) -> str:
+        with rate_limiter.stage("search"):
             search_task = self.tasks.create_search_task(self.search_agent)
-            search_result = search_task.execute_sync(agent=self.search_agent)
-            logger.info("Search Task completed.")
-            time.sleep(25)
-
-            # --- Step 2: Summarize ---
-            logger.info("Executing Summary Task...")
-            summary_task = self.tasks.create_summary_task(self.summary_agent)
-            summary_result = summary_task.execute_sync(
-                agent=self.summary_agent,
-                context=search_result.raw  # <-- ADDED .raw
+            return self._execute_task(
+                search_task, self.search_agent, context=json.dumps(news, indent=2) if news else None
             )
-            logger.info("Summary Task completed.")
-            time.sleep(25)
 
-            # --- Step 3: Format ---
-            logger.info("Executing Formatting Task...")
+    def collect_facts(self) -> Optional[MarketFacts]:
+        """Market analytics for the summary prompt (None if the data fetch fails)."""
+        return collect_market_facts()
+
+    def run_summary(self, search_result: str, market_facts: Optional[MarketFacts] = None) -> str:
+        with rate_limiter.stage("summary"):
+            summary_task = self.tasks.create_summary_task(
+                self.summary_agent,
+                market_facts=market_facts.to_prompt() if market_facts else None,
+                facts_current=market_facts.is_current if market_facts else True,
+            )
+            summary_context = compress_context(
+                search_result, MarketTasks.SEARCH_TOPICS, Config.SUMMARY_CONTEXT_TOKEN_BUDGET
+            )
+            return self._execute_task(summary_task, self.summary_agent, context=summary_context)
+
+    def run_format(self, summary_result: str) -> str:
+        with rate_limiter.stage("format"):
             formatting_task = self.tasks.create_formatting_task(self.formatting_agent)
-            formatted_result = formatting_task.execute_sync(
-                agent=self.formatting_agent,
-                context=summary_result.raw  # <-- ADDED .raw
+            return self._execute_task(formatting_task, self.formatting_agent, context=summary_result)
+
+    def collect_news(self) -> List[dict]:
+        """Fetch every configured news query concurrently and collapse near-duplicate stories."""
+        start = time.perf_counter()
+        news = dedupe_articles(tavily_search_tool.search_many(Config.NEWS_SEARCH_QUERIES))
+        logger.info(
+            f"Collected {len(news)} unique news items from {len(Config.NEWS_SEARCH_QUERIES)} queries "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        logger.info(f"Search cache stats: {search_cache_stats()}")
+        return news
+
+    def _checkpoint(self, stage: str, value, seconds: float = None):
+        """Checkpoint a stage finished outside CheckpointStore.run (e.g. one translation of several)."""
+        if self.checkpoints is not None:
+            self.checkpoints.save(stage, value, seconds)
+
+    def _execute_task(self, task: Task, agent, context: Optional[str] = None) -> str:
+        """
+        Run a task and return its raw text, serving repeats from the on-disk LLM cache.
+        The key covers the model, the agent's system prompt, the task and its context.
+        """
+        key = None
+        if self.llm_cache is not None:
+            key = DiskCache.make_key(
+                self.agents.model_name, agent.role, agent.goal, agent.backstory,
+                task.description, task.expected_output, context or "",
             )
-            logger.info("Formatting Task completed.")
-
-            # --- Step 4: Translate (in a loop with delays) ---
-            translations = {'en': formatted_result.raw} # <-- ADDED .raw
-            for lang in Config.TRANSLATION_LANGUAGES:
-                time.sleep(25)
-                logger.info(f"Executing Translation Task for: {lang.upper()}")
-                translation_task = self.tasks.create_translation_task(self.translation_agent, lang=lang)
-                translated_text = translation_task.execute_sync(
-                    agent=self.translation_agent,
-                    context=formatted_result.raw  # <-- ADDED .raw
-                )
-                translations[lang] = translated_text.raw # <-- ADDED .raw
-                logger.info(f"Translation to {lang.upper()} completed.")
-
-            # --- Step 5: Finalize & Generate PDF ---
-            final_output = "\n\n---\n\n".join([f"Language: {lang}\n\n{text}" for lang, text in translations.items()])
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for agent '{agent.role}'; skipping provider call.")
+                return cached
 
-            logger.info("Generating PDF output")
-            self.generate_pdf_output(translations)
+        result = task.execute_sync(agent=agent, context=context).raw
+        if key is not None:
+            self.llm_cache.set(key, result)
+        return result
 
-            logger.info("Daily market summary workflow finished successfully.")
-            return final_output
+    def _translate_one(self, lang: str, source_text: str) -> str:
+        """Translate the formatted summary into one language with a dedicated agent."""
+        # CrewAI agents keep per-execution state, so concurrent translations must not share one.
+        agent = self.agents.create_translation_agent()
+        with rate_limiter.stage(f"translate_{lang}"):
+            if self.translation_memory is not None:
+                translated = self._translate_segments(agent, lang, source_text)
+                if translated is not None:
+                    return translated
+            translation_task = self.tasks.create_translation_task(agent, lang=lang)
+            return self._execute_task(translation_task, agent, context=source_text)
+
+    def _translate_segments(self, agent, lang: str, source_text: str) -> Optional[str]:
+        """
+        Translate through the translation memory: reuse stored segments and send only
+        the unknown ones to the LLM. Returns None if the reply cannot be aligned.
+        """
+        document = segment_markdown(source_text)
+        segments = document.segments
+        known = self.translation_memory.lookup(segments, lang)
+        missing = [segment for segment in segments if segment not in known]
+        logger.info(f"Translation memory [{lang}]: {len(known)}/{len(segments)} segments reused, {len(missing)} to translate")
+
+        if missing:
+            segment_task = self.tasks.create_segment_translation_task(agent, lang=lang)
+            raw = self._execute_task(segment_task, agent, context=json.dumps(missing, ensure_ascii=False))
+            translated = parse_segment_translation(raw, len(missing))
+            if translated is None:
+                logger.warning(f"Segment translation for {lang.upper()} did not line up; translating the whole document.")
+                return None
+            new_entries = dict(zip(missing, translated))
+            self.translation_memory.store(new_entries, lang)
+            known.update(new_entries)
+
+        return document.render(known)
+
+    def translate_all(self, source_text: str, languages: List[str], log_usage: bool = True) -> Dict[str, str]:
+        """
+        Translate the formatted summary into every language.
+        In batched mode one call covers all languages and only the languages it
+        misses go through the per-language path. Results come back in
+        `languages` order; a language that fails everywhere is logged and left out.
+        """
+        languages = [lang.strip() for lang in languages if lang.strip()]
+        if not languages:
+            return {}
+
+        step_start = time.perf_counter()
+        results = {}
+        if self.checkpoints is not None:
+            results.update({lang: self.checkpoints.load(f"translate_{lang}")
+                            for lang in languages if self.checkpoints.has(f"translate_{lang}")})
+            if results:
+                logger.info(f"Checkpoint: reusing translations for {', '.join(l.upper() for l in results)}")
+        pending = [lang for lang in languages if lang not in results]
+        if Config.TRANSLATION_MODE == "batched" and len(pending) > 1:
+            batched = self._translate_batched(source_text, pending)
+            for lang, text in batched.items():
+                self._checkpoint(f"translate_{lang}", text)
+            results.update(batched)
+        remaining = [lang for lang in pending if lang not in results]
+        if remaining:
+            results.update(self._translate_concurrently(source_text, remaining))
+
+        logger.info(
+            f"Translation step finished in {time.perf_counter() - step_start:.1f}s "
+            f"({len(results)}/{len(languages)} succeeded, mode={Config.TRANSLATION_MODE})"
+        )
+        if log_usage:
+            self._log_translation_usage(languages)
+            if self.translation_memory is not None:
+                self.translation_memory.log_stats()
+        return {lang: results[lang] for lang in languages if lang in results}
 
+    def _translate_batched(self, source_text: str, languages: List[str]) -> Dict[str, str]:
+        """Ask for every language in one call; return only the languages that validated."""
+        agent = self.agents.create_translation_agent()
+        try:
+            with rate_limiter.stage("translate_batch"):
+                batch_task = self.tasks.create_batch_translation_task(agent, languages)
+                batch_result = self._execute_task(batch_task, agent, context=source_text)
         except Exception as e:
-            logger.error(f"Error in daily summary workflow: {e}")
-            raise
+            logger.error(f"Batched translation failed, falling back to per-language translation: {e}")
+            return {}
+
+        translations, rejected = parse_batch_translation(batch_result, languages, source_text)
+        if rejected:
+            logger.warning(
+                f"Batched translation missing or invalid for {', '.join(l.upper() for l in rejected)}; "
+                f"retrying those per language."
+            )
+        return translations
+
+    def _translate_concurrently(self, source_text: str, languages: List[str]) -> Dict[str, str]:
+        """Fan one translation task per language out over a bounded worker pool."""
+        workers = max(1, min(Config.TRANSLATION_CONCURRENCY, len(languages)))
+        logger.info(f"Translating into {', '.join(l.upper() for l in languages)} with {workers} worker(s)")
+        results, durations = {}, {}
+
+        def run(lang):
+            start = time.perf_counter()
+            try:
+                return self._translate_one(lang, source_text)
+            finally:
+                durations[lang] = time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate") as pool:
+            futures = {pool.submit(run, lang): lang for lang in languages}
+            for future in as_completed(futures):
+                lang = futures[future]
+                try:
+                    results[lang] = future.result()
+                    self._checkpoint(f"translate_{lang}", results[lang], durations[lang])
+                    logger.info(f"Translation to {lang.upper()} completed in {durations[lang]:.1f}s.")
+                except Exception as e:
+                    logger.error(f"Translation to {lang.upper()} failed: {e}")
+
+        if durations:
+            logger.info(f"Slowest per-language translation took {max(durations.values()):.1f}s")
+        return results
+
+    def _log_translation_usage(self, languages: List[str]):
+        """Report tokens and latency of the batched call next to the per-language calls."""
+        stats = rate_limiter.stage_stats
+        rows = [("batched", stats["translate_batch"])] if "translate_batch" in stats else []
+        per_language = [stats[f"translate_{lang}"] for lang in languages if f"translate_{lang}" in stats]
+        if per_language:
+            rows.append((f"per-language x{len(per_language)}", {
+                key: sum(s[key] for s in per_language)
+                for key in ("calls", "elapsed_seconds", "prompt_tokens", "completion_tokens")
+            }))
+        for label, row in rows:
+            logger.info(
+                f"Translation usage [{label}]: {int(row['calls'])} LLM call(s), "
+                f"{int(row['prompt_tokens'])} prompt / {int(row['completion_tokens'])} completion tokens, "
+                f"{row['elapsed_seconds']:.1f}s of call time"
+            )
 
     def generate_pdf_output(self, all_translations: Dict):
         """Generate PDF output from the collected translation results."""
@@ -110,6 +382,31 @@ class MarketSummaryCrew:
             logger.error(f"PDF generation failed: {e}")
             raise
 
+    def deliver_output(self, translations: Dict[str, str], files_generated: List[str],
+                       image_paths: Optional[List[str]] = None, previous: Optional[dict] = None) -> dict:
+        """
+        Fan the translations out to their Telegram chats and write the delivery report.
+        Chats that `previous` (an earlier report) records as delivered are not sent again.
+        Raises if no chat received the summary, so the send stage is not recorded as done.
+        """
+        start = time.perf_counter()
+        fanout = FanOutDelivery()
+        if image_paths is None:
+            image_paths = resolve_images(translations.get('en', ''))
+        already = delivered_chats(previous)
+        if already:
+            logger.info(f"Skipping {len(already)} chats already delivered by the earlier attempt")
+        reports = already + fanout.deliver(translations, image_paths=image_paths,
+                                           skip_chats=[report.chat_id for report in already])
+        report = build_delivery_report(reports, translations, files_generated,
+                                       time.perf_counter() - start, fanout.delivery)
+        logger.info(f"Delivery report ({report['status']}) written to {write_delivery_report(report)}")
+        if report['status'] == 'failed' and reports:
+            raise RuntimeError(f"Telegram delivery failed: {report['message']}")
+        if report['status'] == 'partial':
+            logger.warning(f"{report['message']}; resume the run to retry the remaining chats")
+        return report
+
     def cleanup(self):
         """Clean up temporary files"""
         try:
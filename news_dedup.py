@@ -0,0 +1,120 @@
+# news_dedup.py
+
+"""
+Near-duplicate clustering for news search results.
+
+Each article's title and content are shingled into word bigrams and reduced to
+a MinHash signature. Locality-sensitive hashing over signature bands finds
+candidate pairs in linear time, and pairs whose estimated Jaccard similarity
+clears the threshold are merged into clusters. The best-scored article of each
+cluster is kept and the others are attached to it as citations.
+"""
+
+import logging
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r'\w+')
+
+_rng = np.random.default_rng(20240916)
+_A = _rng.integers(1, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _shingles(article: dict) -> np.ndarray:
+    words = _WORD.findall(f"{article.get('title', '')} {article.get('content', '')}".lower())
+    if len(words) < 2:
+        grams = set(words)
+    else:
+        grams = {f"{a} {b}" for a, b in zip(words, words[1:])}
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) % _PRIME for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash_signature(article: dict) -> np.ndarray:
+    """MinHash signature of an article's title and content bigrams."""
+    hashes = _shingles(article)
+    if hashes.size == 0:
+        return np.full(NUM_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def cluster_articles(articles: List[dict], threshold: float = None) -> List[List[int]]:
+    """Group article indexes into clusters of near-duplicates."""
+    threshold = Config.NEWS_DEDUP_THRESHOLD if threshold is None else threshold
+    if not articles:
+        return []
+    signatures = np.vstack([minhash_signature(article) for article in articles])
+    union_find = _UnionFind(len(articles))
+
+    for band in range(BANDS):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        rows = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        for index, row in enumerate(rows):
+            buckets[row.tobytes()].append(index)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                if union_find.find(first) == union_find.find(other):
+                    continue
+                if np.mean(signatures[first] == signatures[other]) >= threshold:
+                    union_find.union(first, other)
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for index in range(len(articles)):
+        clusters[union_find.find(index)].append(index)
+    return list(clusters.values())
+
+
+def dedupe_articles(articles: List[dict], threshold: float = None) -> List[dict]:
+    """
+    Keep the best-scored article of each near-duplicate cluster, with the other
+    members attached as `citations`. Results are sorted by score.
+    """
+    kept = []
+    for members in cluster_articles(articles, threshold):
+        ranked = sorted(
+            members,
+            key=lambda i: (articles[i].get('score') or 0, len(articles[i].get('content') or '')),
+            reverse=True,
+        )
+        best = dict(articles[ranked[0]])
+        citations = [
+            {'title': articles[i].get('title', ''), 'url': articles[i].get('url', '')}
+            for i in ranked[1:]
+        ]
+        if citations:
+            best['citations'] = list(best.get('citations', [])) + citations
+        kept.append(best)
+
+    kept.sort(key=lambda article: article.get('score') or 0, reverse=True)
+    if len(kept) < len(articles):
+        logger.info(f"News dedup: {len(articles)} articles -> {len(kept)} clusters")
+    return kept
@@ -0,0 +1,239 @@
+# ohlcv_store.py
+
+"""
+Local OHLCV bar store for market data.
+
+Each symbol's daily bars live in one flat file of fixed-size NumPy records
+(timestamp plus OHLCV), sorted by time. Reads are zero-copy memory maps.
+Writes build the new file under a temporary name and rename it into place, so
+a reader's memory map keeps the old bars and a crash never truncates the
+history; a bar at or after the first new timestamp is overwritten, so a
+still-forming last bar is replaced by its final values.
+
+StoreBackedProvider sits in front of a real provider: symbols already in the
+store only download the bars since their last stored bar, a re-adjusted history
+(after a split or dividend) is downloaded again in full, and everything is then
+served from the store.
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from market_data import OHLCV_FIELDS, MarketDataProvider, _as_wide_frame, period_bars
+
+logger = logging.getLogger(__name__)
+
+BAR_DTYPE = np.dtype([
+    ('ts', '<i8'),  # bar timestamp, ns since epoch
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+_RECORD_FIELDS = dict(zip(OHLCV_FIELDS, ['open', 'high', 'low', 'close', 'volume']))
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9._^=-]')
+
+# One lock per bar file for the whole process, shared by every OHLCVStore instance
+_FILE_LOCKS: Dict[str, threading.Lock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+
+def _file_lock(path: str) -> threading.Lock:
+    with _FILE_LOCKS_GUARD:
+        return _FILE_LOCKS.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def frame_to_records(frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Sorted bar records per symbol from a (field, symbol) frame, skipping bars without a close."""
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    order = np.argsort(index.as_unit('ns').asi8, kind='stable')
+    timestamps = index.as_unit('ns').asi8[order]
+    symbols = list(frame['Close'].columns)
+    fields = set(frame.columns.get_level_values(0))
+    # One 2-D array per field, so the per-symbol loop below stays in NumPy
+    values = {
+        name: (frame[field].reindex(columns=symbols).to_numpy(dtype=float)[order]
+               if field in fields else np.full((len(order), len(symbols)), np.nan))
+        for field, name in _RECORD_FIELDS.items()
+    }
+
+    records = {}
+    for column, symbol in enumerate(symbols):
+        valid = ~np.isnan(values['close'][:, column])
+        bars = np.zeros(int(valid.sum()), dtype=BAR_DTYPE)
+        bars['ts'] = timestamps[valid]
+        for name, array in values.items():
+            bars[name] = array[valid, column]
+        records[symbol] = bars
+    return records
+
+
+class OHLCVStore:
+    """Per-symbol memory-mapped bar files under one directory."""
+
+    def __init__(self, root: str = None):
+        self.root = root or Config.OHLCV_STORE_DIR
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{_UNSAFE_FILENAME.sub('_', symbol)}.bin")
+
+    def read(self, symbol: str) -> np.ndarray:
+        """All stored bars for `symbol` as a read-only memory map (empty if none)."""
+        path = self._path(symbol)
+        try:
+            count = os.path.getsize(path) // BAR_DTYPE.itemsize
+        except OSError:
+            count = 0
+        if count == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(path, dtype=BAR_DTYPE, mode='r', shape=(count,))
+
+    def last_timestamp(self, symbol: str) -> Optional[pd.Timestamp]:
+        bars = self.read(symbol)
+        return pd.Timestamp(int(bars['ts'][-1])) if len(bars) else None
+
+    def write(self, symbol: str, records: np.ndarray, replace: bool = False):
+        """
+        Append `records` to the symbol's file. Stored bars at or after the first
+        new timestamp are overwritten; `replace` rewrites the whole file.
+        """
+        if len(records) == 0:
+            return
+        path = self._path(symbol)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with _file_lock(path):
+            try:
+                with open(temp_path, 'wb') as handle:
+                    if not replace:
+                        stored = self.read(symbol)
+                        keep = int(np.searchsorted(stored['ts'], records['ts'][0])) if len(stored) else 0
+                        handle.write(stored[:keep].tobytes())
+                        del stored
+                    handle.write(records.astype(BAR_DTYPE, copy=False).tobytes())
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def import_frame(self, frame: pd.DataFrame, replace: bool = False) -> int:
+        """Store every symbol of a (field, symbol) frame, e.g. a provider download or a fixture. Returns bars written."""
+        if frame is None or frame.empty:
+            return 0
+        written = 0
+        for symbol, records in frame_to_records(frame).items():
+            self.write(symbol, records, replace=replace)
+            written += len(records)
+        return written
+
+    def load_frame(self, symbols: List[str], bar_count: int, start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """The last `bar_count` bars (or all bars from `start`) of each symbol as a (field, symbol) frame."""
+        windows: Dict[str, np.ndarray] = {}
+        for symbol in symbols:
+            bars = self.read(symbol)
+            if start is not None:
+                windows[symbol] = bars[int(np.searchsorted(bars['ts'], pd.Timestamp(start).value)):]
+            else:
+                windows[symbol] = bars[-bar_count:] if bar_count else bars[:0]
+        windows = {symbol: bars for symbol, bars in windows.items() if len(bars)}
+        if not windows:
+            return _as_wide_frame(None, symbols)
+
+        timestamps = np.unique(np.concatenate([bars['ts'] for bars in windows.values()]))
+        columns = list(windows)
+        data = {field: np.full((len(timestamps), len(columns)), np.nan) for field in OHLCV_FIELDS}
+        for column, symbol in enumerate(columns):
+            bars = windows[symbol]
+            rows = np.searchsorted(timestamps, bars['ts'])
+            for field, name in _RECORD_FIELDS.items():
+                data[field][rows, column] = bars[name]
+
+        index = pd.DatetimeIndex(timestamps.astype('datetime64[ns]'))
+        frame = pd.concat(
+            {field: pd.DataFrame(values, index=index, columns=columns) for field, values in data.items()},
+            axis=1,
+        )
+        return frame
+
+
+class StoreBackedProvider(MarketDataProvider):
+    """
+    Serves bars from the local store, topping it up from `upstream` first.
+    Symbols with enough history fetch only the bars since their last stored one,
+    one request per last-bar date; the rest fetch the full period once. Each
+    delta also re-fetches one already-stored final bar: if its close changed, the
+    upstream has re-adjusted the history (a split or dividend) and the symbol's
+    full history is fetched again. With no upstream the store is read as-is,
+    e.g. for offline runs from fixtures.
+    """
+
+    name = "store"
+    ADJUSTMENT_TOLERANCE = 1e-6  # relative close difference that counts as a re-adjustment
+
+    def __init__(self, upstream: Optional[MarketDataProvider] = None, store: OHLCVStore = None):
+        self.upstream = upstream
+        self.store = store or OHLCVStore()
+
+    def _fetch_deltas(self, checks: Dict[str, tuple], period: str) -> List[str]:
+        """Append new bars for symbols grouped by overlap date; returns the symbols whose history was re-adjusted."""
+        groups: Dict[pd.Timestamp, List[str]] = {}
+        for symbol, (start, _) in checks.items():
+            groups.setdefault(start, []).append(symbol)
+        adjusted = []
+        for start, group in sorted(groups.items()):
+            records = frame_to_records(self.upstream.fetch(group, period, start=start))
+            written = 0
+            for symbol in group:
+                bars = records.get(symbol)
+                if bars is None or not len(bars):
+                    continue
+                overlap = bars[bars['ts'] == start.value]
+                stored_close = checks[symbol][1]
+                if len(overlap) and not np.isclose(overlap['close'][0], stored_close,
+                                                   rtol=self.ADJUSTMENT_TOLERANCE, atol=0.0):
+                    adjusted.append(symbol)
+                    continue
+                self.store.write(symbol, bars)
+                written += len(bars)
+            logger.info(f"OHLCV store: fetched {written} bars since {start.date()} for {len(group)} symbols")
+        if adjusted:
+            logger.info(f"OHLCV store: stored history of {', '.join(adjusted)} was re-adjusted upstream, refetching")
+        return adjusted
+
+    def sync(self, symbols: List[str], period: str):
+        """Bring the stored bars for `symbols` up to date for `period`."""
+        bar_count = period_bars(period)
+        missing, checks = [], {}
+        for symbol in symbols:
+            bars = self.store.read(symbol)
+            if len(bars) < max(bar_count, 2):
+                missing.append(symbol)
+            else:
+                # The bar before the last is final, so it should come back unchanged unless prices were re-adjusted.
+                checks[symbol] = (pd.Timestamp(int(bars['ts'][-2])), float(bars['close'][-2]))
+
+        try:
+            if checks:
+                missing.extend(self._fetch_deltas(checks, period))
+            if missing:
+                written = self.store.import_frame(self.upstream.fetch(missing, period), replace=True)
+                logger.info(f"OHLCV store: fetched {period} history for {len(missing)} symbols ({written} bars)")
+        except Exception as e:
+            logger.warning(f"OHLCV store: upstream fetch failed, serving stored bars: {e}")
+
+    def fetch(self, symbols: List[str], period: str = "1d", start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        if self.upstream is not None:
+            self.sync(symbols, period)
+        return self.store.load_frame(symbols, period_bars(period), start=start)
@@ -1,164 +1,210 @@
 # pdf_generator.py (TYPO FIXED)
 
 import os
-import re
 import logging
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List
-import requests
-from PIL import Image as PILImage
 from io import BytesIO
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Flowable, Frame, PageTemplate, PageBreak
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus.flowables import HRFlowable
 from reportlab.lib.units import inch
-from reportlab.lib.colors import HexColor
+from reportlab.lib.utils import ImageReader
+
+from config import Config
+from font_registry import font_registry
+from image_cache import get_image_fetcher, local_image_path
+from markdown_ast import Heading, ImageBlock, ListItem, Paragraph as TextBlock, Rule, parse_markdown, render_reportlab
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-# Define colors
-PRIMARY_COLOR = HexColor("#1a73e8")
-TEXT_COLOR = HexColor("#202124")
-GRAY_COLOR = HexColor("#5f6368")
+PAGE_SIZE = (8.5 * inch, 11 * inch)
+LANGUAGE_NAMES = {
+    'en': 'English', 'hi': 'Hindi', 'ar': 'Arabic', 'he': 'Hebrew'
+}
+
+
+def _is_remote(url: str) -> bool:
+    return url.lower().startswith(('http://', 'https://'))
+
+
+class SharedImage(Image):
+    """
+    Image flowable drawn from an ImageReader that may be shared with other flowables.
+    The reader decodes the picture once, and the canvas embeds identical pixel data once.
+    """
+
+    def __init__(self, reader: ImageReader, width=None, height=None, kind='direct'):
+        self._img = reader
+        super().__init__(BytesIO(), width=width, height=height, kind=kind)
+
+
+class SectionBookmark(Flowable):
+    """Zero-size marker that bookmarks the page it lands on and adds it to the PDF outline."""
+
+    def __init__(self, title: str, key: str):
+        super().__init__()
+        self.title = title
+        self.key = key
+        self.width = self.height = 0
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+        self.canv.showOutline()
+
+
+class ReportSection(NamedTuple):
+    title: str
+    text: str
+    lang: str = 'en'
+
+
+class StreamingDocBuilder:
+    """
+    Lays out a stream of flowable lists page by page with doc.handle_flowable,
+    instead of holding a whole story for doc.build. Each section's flowables are
+    released once laid out, and finished pages are written out by the canvas, so
+    memory stays flat however many sections the report has. The file is built
+    under a temporary name and renamed into place when complete.
+    """
+
+    def __init__(self, path: str, pagesize=PAGE_SIZE):
+        self.path = path
+        self.pagesize = pagesize
+        self.pages = 0
+
+    def _open(self, path: str) -> SimpleDocTemplate:
+        doc = SimpleDocTemplate(path, pagesize=self.pagesize)
+        doc._calc()
+        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+        doc.addPageTemplates([
+            PageTemplate(id='First', frames=frame, pagesize=self.pagesize),
+            PageTemplate(id='Later', frames=frame, pagesize=self.pagesize),
+        ])
+        doc._startBuild(path)
+        doc.canv._doctemplate = doc
+        return doc
+
+    def build(self, sections: Iterable[List[Flowable]]):
+        temp_path = f"{self.path}.tmp"
+        try:
+            doc = self._open(temp_path)
+            for flowables in sections:
+                pending = list(flowables)
+                del flowables
+                while pending:
+                    doc.clean_hanging()
+                    doc.handle_flowable(pending)
+            del doc.canv._doctemplate
+            doc._endBuild()
+            self.pages = doc.page
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
 
 class PDFGenerator:
     def __init__(self, output_dir: str = "output"):
         self.output_dir = output_dir
-        self.temp_image_paths = []
-        self._register_fonts()
-        self.styles = self._create_styles()
+        self._image_readers: Dict[str, Optional[ImageReader]] = {}
+        self._image_paths: Dict[str, Optional[str]] = {}
+        # Fonts and styles are shared by every generator in the process; script fonts load on first use.
+        self.styles = font_registry.styles()
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def _register_fonts(self):
-        """Register fonts needed for multilingual support."""
-        font_map = {
-            'NotoSansArabic': 'fonts/NotoSansArabic-Regular.ttf',
-            'NotoSansHebrew': 'fonts/NotoSansHebrew-Regular.ttf',
-            'NotoSansDevanagari': 'fonts/NotoSansDevanagari-Regular.ttf'
-        }
-        for name, path in font_map.items():
-            try:
-                if os.path.exists(path):
-                    pdfmetrics.registerFont(TTFont(name, path))
-                else:
-                    raise FileNotFoundError
-            except Exception:
-                logger.warning(
-                    f"Font not found: {path}. "
-                    f"Please download it and place it in the '{os.path.dirname(path)}' directory "
-                    f"for proper {name.replace('NotoSans', '')} language support in the PDF."
-                )
-
-    def _create_styles(self) -> Dict:
-        """Create ParagraphStyle objects for the PDF."""
-        styles = getSampleStyleSheet()  # <-- TYPO FIXED HERE
-        styles.add(ParagraphStyle(
-            name='TitleStyle',
-            fontName='Helvetica-Bold',
-            fontSize=24,
-            leading=28,
-            textColor=PRIMARY_COLOR,
-            alignment=TA_CENTER,
-            spaceAfter=20
-        ))
-        styles.add(ParagraphStyle(
-            name='LangHeaderStyle',
-            fontName='Helvetica-Bold',
-            fontSize=16,
-            leading=20,
-            textColor=TEXT_COLOR,
-            spaceBefore=20,
-            spaceAfter=10
-        ))
-        # Base body style for English
-        styles.add(ParagraphStyle(
-            name='BodyStyle',
-            fontName='Helvetica',
-            fontSize=10,
-            leading=14,
-            textColor=GRAY_COLOR,
-            spaceAfter=12
+    def _prefetch_images(self, all_translations: Dict):
+        """Download every image of every section at once and decode each distinct URL once."""
+        urls = list(dict.fromkeys(
+            image.url for text in all_translations.values() if text for image in parse_markdown(text).images
         ))
-        # Styles for other languages, falling back to Helvetica if font is missing
-        styles.add(ParagraphStyle(
-            name='BodyStyle_ar',
-            parent=styles['BodyStyle'],
-            fontName='NotoSansArabic' if 'NotoSansArabic' in pdfmetrics.getRegisteredFontNames() else 'Helvetica',
-            alignment=TA_RIGHT
-        ))
-        styles.add(ParagraphStyle(
-            name='BodyStyle_he',
-            parent=styles['BodyStyle'],
-            fontName='NotoSansHebrew' if 'NotoSansHebrew' in pdfmetrics.getRegisteredFontNames() else 'Helvetica',
-            alignment=TA_RIGHT
-        ))
-        styles.add(ParagraphStyle(
-            name='BodyStyle_hi',
-            parent=styles['BodyStyle'],
-            fontName='NotoSansDevanagari' if 'NotoSansDevanagari' in pdfmetrics.getRegisteredFontNames() else 'Helvetica',
-            alignment=TA_LEFT
-        ))
-        return styles
+        if not urls:
+            return
+        # Local charts and cached images are read directly; only http(s) URLs are downloaded,
+        # and any other reference (e.g. a local file outside the image directories) is skipped.
+        paths = {url: (url if local_image_path(url) else None) for url in urls}
+        remote = [url for url in urls if paths[url] is None and _is_remote(url)]
+        if remote:
+            paths.update(get_image_fetcher().fetch_many(remote))
+        for url, path in paths.items():
+            self._image_paths[url] = path
+            self._image_readers[url] = self._load_reader(path) if path else None
+        logger.info(f"Prefetched {len(urls)} images for the PDF")
+
+    @staticmethod
+    def _load_reader(path: str) -> Optional[ImageReader]:
+        try:
+            with open(path, 'rb') as handle:
+                return ImageReader(BytesIO(handle.read()))
+        except Exception as e:
+            logger.error(f"Could not read cached image {path}: {e}")
+            return None
 
     def _fetch_image(self, url: str) -> Image:
-        """Fetch an image from a URL and prepare it for the PDF."""
+        """Image flowable for a URL, sharing one in-memory reader per URL (no temp files)."""
         try:
-            # Add a browser-like header to avoid being blocked
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'}
-            response = requests.get(url, timeout=10, headers=headers) # <-- ADDED headers
-            response.raise_for_status()
-            img_data = BytesIO(response.content)
-
-            # Create a temporary file to save the image
-            ext = PILImage.open(img_data).format.lower()
-            temp_path = f"temp_image.{ext}"
-            with open(temp_path, "wb") as f:
-                f.write(img_data.getvalue())
-            self.temp_image_paths.append(temp_path)
+            if url not in self._image_readers:
+                path = local_image_path(url) or (get_image_fetcher().fetch(url) if _is_remote(url) else None)
+                self._image_readers[url] = self._load_reader(path) if path else None
+            reader = self._image_readers[url]
+            if reader is None:
+                return None
 
             # Create ReportLab Image, preserving aspect ratio
-            img = Image(temp_path, width=4*inch, height=3*inch, kind='proportional')
+            img = SharedImage(reader, width=4*inch, height=3*inch, kind='proportional')
             img.hAlign = 'CENTER'
             return img
         except Exception as e:
             logger.error(f"Could not fetch or process image from {url}: {e}")
             return None
 
-    def _parse_markdown(self, text: str, style: ParagraphStyle) -> List:
-        """Parse markdown text into a list of ReportLab Flowables."""
+    def _parse_markdown(self, text: str, style: ParagraphStyle, lang_code: str = 'en') -> List:
+        """Convert markdown text into a list of ReportLab Flowables (the parsed AST is cached)."""
         flowables = []
-        lines = text.split('\n')
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            # Handle images: ![alt](url)
-            img_match = re.match(r'!\[.*?\]\((.*?)\)', line)
-            if img_match:
-                img_url = img_match.group(1)
-                img = self._fetch_image(img_url)
+        for block in parse_markdown(text).blocks:
+            if isinstance(block, ImageBlock):
+                img = self._fetch_image(block.url)
                 if img:
                     flowables.append(img)
-                continue
-
-            # Handle headings: # Title
-            if line.startswith('# '):
-                heading_text = line[2:]
-                flowables.append(Paragraph(heading_text, self.styles['LangHeaderStyle']))
-                continue
+            elif isinstance(block, Heading):
+                heading_style = font_registry.heading_style(lang_code, block.level)
+                flowables.append(Paragraph(render_reportlab(block.children), heading_style))
+            elif isinstance(block, ListItem):
+                marker = f"{block.number}." if block.number else "•"
+                flowables.append(Paragraph(f"{marker} {render_reportlab(block.children)}", style))
+            elif isinstance(block, TextBlock):
+                flowables.append(Paragraph(render_reportlab(block.children), style))
+            elif isinstance(block, Rule):
+                flowables.append(HRFlowable(width='100%', thickness=0.5, color=style.textColor,
+                                            spaceBefore=4, spaceAfter=8))
+        return flowables
 
-            # Handle bullet points: * point
-            if line.startswith('* '):
-                line = f"• {line[2:]}" # Replace markdown '*' with a bullet character
+    def _title_flowables(self) -> List:
+        return self._title_flowables_for("Daily Market Summary")
 
-            flowables.append(Paragraph(line, style))
+    def _section_flowables(self, lang_code: str, text: str, title: str = None, key: str = None) -> List:
+        """Header, bookmark and parsed body of one section (by default, one language's summary)."""
+        lang_name = LANGUAGE_NAMES.get(lang_code, lang_code.upper())
+        title = title or f"Summary in {lang_name}"
+        flowables = [
+            SectionBookmark(title, key or f"section_{lang_code}"),
+            Paragraph(title, self.styles['LangHeaderStyle']),
+        ]
+        body_style = font_registry.body_style(lang_code)
 
+        # Parse markdown content
+        flowables.extend(self._parse_markdown(text, body_style, lang_code))
+        flowables.append(Spacer(1, 0.25 * inch))
         return flowables
 
     def generate_pdf(self, all_translations: Dict) -> str:
@@ -166,48 +212,113 @@ class PDFGenerator:
         try:
             date_str = datetime.now().strftime("%Y-%m-%d")
             file_path = os.path.join(self.output_dir, f"market_summary_{date_str}.pdf")
+            sections = [(lang_code, text) for lang_code, text in all_translations.items() if text]
+            self._prefetch_images(all_translations)
 
-            doc = SimpleDocTemplate(file_path, pagesize=(8.5 * inch, 11 * inch))
-            story = []
+            start = time.perf_counter()
+            workers = min(len(sections), Config.PDF_RENDER_WORKERS or os.cpu_count() or 1)
+            if Config.PDF_PARALLEL_MIN_SECTIONS and len(sections) >= Config.PDF_PARALLEL_MIN_SECTIONS and workers > 1:
+                self._build_parallel(file_path, sections, workers)
+                mode = f"parallel, {workers} workers"
+            else:
+                story = self._title_flowables()
+                for index, (lang_code, text) in enumerate(sections):
+                    if index:
+                        story.append(PageBreak())  # each language starts a page, as in the parallel parts
+                    story.extend(self._section_flowables(lang_code, text))
+                SimpleDocTemplate(file_path, pagesize=PAGE_SIZE).build(story)
+                mode = "single story"
 
-            # Add main title
-            story.append(Paragraph("Daily Market Summary", self.styles['TitleStyle']))
-            story.append(Spacer(1, 0.25 * inch))
+            logger.info(
+                f"Successfully generated PDF: {file_path} "
+                f"({len(sections)} sections, {mode}, {time.perf_counter() - start:.2f}s)"
+            )
+            logger.debug(f"Font registry timings (ms): {font_registry.stats()}")
+            return file_path
+        except Exception as e:
+            logger.error(f"PDF generation failed: {e}")
+            raise
+        finally:
+            self.cleanup_temp_files()
 
-            language_map = {
-                'en': 'English', 'hi': 'Hindi', 'ar': 'Arabic', 'he': 'Hebrew'
-            }
+    def _build_parallel(self, file_path: str, sections: List, workers: int):
+        """
+        Render each language into its own PDF in a process pool, then merge them in order.
+        Each language starts on a new page, as in the single-story build. Images shared
+        across sections are embedded once per part and deduplicated in the merge.
+        """
+        from pypdf import PdfWriter
 
-            for lang_code, text in all_translations.items():
-                if not text:
-                    continue
+        image_paths = {url: path for url, path in self._image_paths.items() if path}
+        with tempfile.TemporaryDirectory(dir=self.output_dir) as parts_dir:
+            jobs = [
+                (index, lang_code, text, os.path.join(parts_dir, f"part_{index:03d}.pdf"), image_paths)
+                for index, (lang_code, text) in enumerate(sections)
+            ]
+            # Spawned, not forked: DAG, image-fetch and litellm threads may hold locks a fork would copy.
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                part_paths = list(pool.map(_render_section, jobs))
 
-                lang_name = language_map.get(lang_code, lang_code.upper())
-                story.append(Paragraph(f"Summary in {lang_name}", self.styles['LangHeaderStyle']))
+            writer = PdfWriter()
+            for part_path in part_paths:
+                # Each part carries its own section bookmark, which becomes its outline entry.
+                writer.append(part_path, import_outline=True)
+            writer.page_mode = "/UseOutlines"
+            # Every part embeds its own copy of a shared image; keep one copy of each identical stream.
+            writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+            with open(file_path, 'wb') as handle:
+                writer.write(handle)
+            writer.close()
 
-                body_style_name = f"BodyStyle_{lang_code}"
-                body_style = self.styles.get(body_style_name, self.styles['BodyStyle'])
+    def generate_report(self, sections: Iterable[ReportSection], file_name: str,
+                        title: str = "Market Summary Report") -> str:
+        """
+        Stream a long report (e.g. a week or month of daily summaries) into one PDF.
+        Sections are pulled from the iterable one at a time, their images are loaded
+        just for that section, and their flowables are dropped once laid out.
+        """
+        file_path = os.path.join(self.output_dir, file_name)
 
-                # Parse markdown content
-                content_flowables = self._parse_markdown(text, body_style)
-                story.extend(content_flowables)
-                story.append(Spacer(1, 0.25 * inch))
+        def section_flowables():
+            yield self._title_flowables_for(title)
+            for index, section in enumerate(sections):
+                if not section.text:
+                    continue
+                self._image_readers, self._image_paths = {}, {}
+                self._prefetch_images({section.lang: section.text})
+                yield self._section_flowables(section.lang, section.text, section.title, key=f"section_{index}")
 
-            doc.build(story)
-            logger.info(f"Successfully generated PDF: {file_path}")
+        try:
+            start = time.perf_counter()
+            builder = StreamingDocBuilder(file_path)
+            builder.build(section_flowables())
+            logger.info(
+                f"Successfully generated report: {file_path} ({builder.pages} pages, "
+                f"{time.perf_counter() - start:.2f}s)"
+            )
             return file_path
         except Exception as e:
-            logger.error(f"PDF generation failed: {e}")
+            logger.error(f"Report generation failed: {e}")
             raise
         finally:
             self.cleanup_temp_files()
 
+    def _title_flowables_for(self, title: str) -> List:
+        return [Paragraph(title, self.styles['TitleStyle']), Spacer(1, 0.25 * inch)]
+
     def cleanup_temp_files(self):
-        """Remove temporary image files."""
-        for path in self.temp_image_paths:
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                logger.warning(f"Failed to remove temporary file {path}: {e}")
-        self.temp_image_paths = []
\ No newline at end of file
+        """Release the decoded images of the last build."""
+        self._image_readers = {}
+        self._image_paths = {}
+
+
+def _render_section(job: Tuple) -> str:
+    """Process-pool worker: lay out one language section (the first also gets the title) into its own PDF."""
+    index, lang_code, text, part_path, image_paths = job
+    generator = PDFGenerator(output_dir=os.path.dirname(part_path))
+    generator._image_paths = dict(image_paths)
+    generator._image_readers = {url: generator._load_reader(path) for url, path in image_paths.items()}
+    story = generator._title_flowables() if index == 0 else []
+    story.extend(generator._section_flowables(lang_code, text))
+    SimpleDocTemplate(part_path, pagesize=PAGE_SIZE).build(story)
+    return part_path
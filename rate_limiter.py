@@ -0,0 +1,272 @@
+# rate_limiter.py
+
+"""
+Shared rate limiter for every LLM call made by the agents.
+
+A request bucket and a token bucket are refilled continuously at the configured
+per-minute rates. The provider's rate-limit headers (and retry-after on 429s) are
+folded back into the buckets, so calls only wait when the quota is actually tight.
+"""
+
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from config import Config
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_RETRY_IN_MESSAGE = re.compile(r'try again in ((?:\d+(?:\.\d+)?(?:ms|h|m|s))+)', re.IGNORECASE)
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """Parse provider durations such as '7.66s', '2m59.56s', '120ms' or '30' into seconds."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(text)
+    if not parts:
+        return None
+    units = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, capacity: float, rate_per_minute: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate_per_minute) / 60.0
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens now and return how many seconds the caller must wait before using them."""
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0 or self.rate <= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def adjust(self, amount: float):
+        """Give back (positive) or take away (negative) tokens after the real cost is known."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def sync(self, remaining: float):
+        """Never allow more than the provider says is left."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimiter:
+    """Request and token budget shared by all agents, with per-stage wait accounting."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute)
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self.stage_stats: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def current_stage(self) -> str:
+        return getattr(self._local, 'stage', None) or 'unscoped'
+
+    def _stats(self, stage: str) -> Dict[str, float]:
+        with self._lock:
+            return self.stage_stats.setdefault(
+                stage, {'calls': 0, 'wait_seconds': 0.0, 'elapsed_seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0}
+            )
+
+    @contextmanager
+    def stage(self, name: str):
+        """Attribute every LLM call made in this thread to `name` and log the time spent waiting."""
+        previous = getattr(self._local, 'stage', None)
+        self._local.stage = name
+        stats = self._stats(name)
+        waited_before = stats['wait_seconds']
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            self._local.stage = previous
+            with self._lock:
+                stats['elapsed_seconds'] += time.perf_counter() - started
+            logger.info(
+                f"Rate limiter: stage '{name}' waited {stats['wait_seconds'] - waited_before:.2f}s "
+                f"({int(stats['calls'])} LLM call(s) so far)"
+            )
+
+    def defer(self, seconds: float, reason: str = ""):
+        """Hold every caller back for `seconds`, e.g. after a 429 or an exhausted quota header."""
+        if not seconds or seconds <= 0:
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Rate limiter: provider asked to back off {seconds:.2f}s {reason}".rstrip())
+
+    def acquire(self, estimated_tokens: int = 0, call_id: Optional[str] = None) -> float:
+        """Block until one request of roughly `estimated_tokens` fits the budget; return the wait."""
+        stage = self.current_stage
+        wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimated_tokens))
+        with self._lock:
+            wait = max(wait, self._blocked_until - time.monotonic())
+            if call_id:
+                self._pending[call_id] = {'stage': stage, 'estimated_tokens': estimated_tokens}
+        if wait > 0:
+            logger.debug(f"Rate limiter: waiting {wait:.2f}s before LLM call in stage '{stage}'")
+            time.sleep(wait)
+        stats = self._stats(stage)
+        with self._lock:
+            stats['calls'] += 1
+            stats['wait_seconds'] += max(wait, 0.0)
+        return max(wait, 0.0)
+
+    def record_usage(self, call_id: Optional[str], prompt_tokens: int, completion_tokens: int):
+        """Correct the token bucket with the real usage of a finished call."""
+        with self._lock:
+            pending = self._pending.pop(call_id, None) if call_id else None
+        stage = pending['stage'] if pending else self.current_stage
+        estimated = pending['estimated_tokens'] if pending else 0
+        self.token_bucket.adjust(estimated - (prompt_tokens + completion_tokens))
+        stats = self._stats(stage)
+        with self._lock:
+            stats['prompt_tokens'] += prompt_tokens
+            stats['completion_tokens'] += completion_tokens
+
+    def release(self, call_id: Optional[str]):
+        """Forget a call that failed and give its estimated tokens back to the bucket."""
+        with self._lock:
+            pending = self._pending.pop(call_id, None) if call_id else None
+        if pending:
+            self.token_bucket.adjust(pending['estimated_tokens'])
+
+    def update_from_headers(self, headers: Optional[Dict[str, Any]]):
+        """Fold x-ratelimit-* and retry-after headers into the buckets."""
+        if not headers:
+            return
+        normalized = {}
+        for key, value in dict(headers).items():
+            key = str(key).lower()
+            if key.startswith('llm_provider-'):
+                key = key[len('llm_provider-'):]
+            normalized[key] = value
+
+        retry_after = parse_duration(normalized.get('retry-after'))
+        if retry_after:
+            self.defer(retry_after, "(retry-after)")
+
+        for kind, bucket in (('requests', self.request_bucket), ('tokens', self.token_bucket)):
+            remaining = normalized.get(f'x-ratelimit-remaining-{kind}')
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except (TypeError, ValueError):
+                continue
+            bucket.sync(remaining)
+            if remaining <= 0:
+                self.defer(parse_duration(normalized.get(f'x-ratelimit-reset-{kind}')) or 0, f"({kind} exhausted)")
+
+    def handle_rate_limit_error(self, error: Exception):
+        """Back off for as long as a 429 response asks."""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if headers and 'retry-after' in {str(k).lower() for k in headers.keys()}:
+            self.update_from_headers(headers)
+            return
+        match = _RETRY_IN_MESSAGE.search(str(error))
+        self.defer(parse_duration(match.group(1)) if match else 60.0, "(rate limit error)")
+
+    def reset_stats(self):
+        """Start a fresh per-stage report (the buckets themselves keep their state)."""
+        with self._lock:
+            self.stage_stats = {}
+
+    def total_wait(self) -> float:
+        with self._lock:
+            return sum(stats['wait_seconds'] for stats in self.stage_stats.values())
+
+    def log_report(self, fixed_pause_seconds: float = 0.0):
+        """Log per-stage waits and compare them with the fixed pauses they replace."""
+        with self._lock:
+            snapshot = {stage: dict(stats) for stage, stats in self.stage_stats.items()}
+        for stage, stats in snapshot.items():
+            logger.info(
+                f"Rate limiter [{stage}]: {int(stats['calls'])} call(s) in {stats['elapsed_seconds']:.2f}s, "
+                f"waited {stats['wait_seconds']:.2f}s, "
+                f"{int(stats['prompt_tokens'])} prompt / {int(stats['completion_tokens'])} completion tokens"
+            )
+        total = sum(stats['wait_seconds'] for stats in snapshot.values())
+        if fixed_pause_seconds:
+            logger.info(
+                f"Rate limiter waited {total:.2f}s in total; fixed pauses would have cost "
+                f"{fixed_pause_seconds:.0f}s ({max(fixed_pause_seconds - total, 0):.2f}s saved)"
+            )
+        else:
+            logger.info(f"Rate limiter waited {total:.2f}s in total")
+
+
+rate_limiter = RateLimiter(Config.LLM_REQUESTS_PER_MINUTE, Config.LLM_TOKENS_PER_MINUTE)
+
+_hooks_installed = False
+
+
+def install_litellm_hooks(limiter: RateLimiter = rate_limiter) -> bool:
+    """Route every litellm completion (which CrewAI uses under the hood) through `limiter`."""
+    global _hooks_installed
+    if _hooks_installed:
+        return True
+    try:
+        import litellm
+        from litellm.integrations.custom_logger import CustomLogger
+    except ImportError:
+        logger.warning("litellm not available; LLM calls will not be rate limited.")
+        return False
+
+    class _RateLimitCallback(CustomLogger):
+        def log_pre_api_call(self, model, messages, kwargs):
+            prompt = ' '.join(str(message.get('content') or '') for message in (messages or []) if isinstance(message, dict))
+            limiter.acquire(count_tokens(prompt), call_id=kwargs.get('litellm_call_id'))
+
+        def log_success_event(self, kwargs, response_obj, start_time, end_time):
+            usage = getattr(response_obj, 'usage', None)
+            limiter.record_usage(
+                kwargs.get('litellm_call_id'),
+                getattr(usage, 'prompt_tokens', 0) or 0,
+                getattr(usage, 'completion_tokens', 0) or 0,
+            )
+            hidden = getattr(response_obj, '_hidden_params', None) or {}
+            limiter.update_from_headers(hidden.get('additional_headers'))
+
+        def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+            # Every failure (timeouts, validation errors, 429s) releases its reservation.
+            limiter.release(kwargs.get('litellm_call_id'))
+            error = kwargs.get('exception')
+            if error is not None and 'ratelimit' in type(error).__name__.lower():
+                limiter.handle_rate_limit_error(error)
+
+    litellm.callbacks = list(getattr(litellm, 'callbacks', None) or []) + [_RateLimitCallback()]
+    _hooks_installed = True
+    return True
@@ -18,8 +18,8 @@ def setup_environment():
         print("Ensure the required environment variables are set in your environment or a .env file.")
         return False
 
-def run_summary():
-    """Run the market summary generation"""
+def run_summary(use_cache=True, resume=None):
+    """Run the market summary generation; `resume` continues a checkpointed run"""
     logger = logging.getLogger(__name__)
 
     try:
@@ -29,8 +29,8 @@ def run_summary():
         logger.info("=" * 50)
 
         # Initialize and run crew
-        crew = MarketSummaryCrew()
-        result = crew.run_daily_summary()
+        crew = MarketSummaryCrew(use_cache=use_cache)
+        result = crew.run_daily_summary(resume=resume)
 
         logger.info("Market summary generation completed successfully")
         if result:
@@ -46,7 +46,19 @@ def run_summary():
         logger.exception("Full traceback:")
         return False
 
-def schedule_daily_run():
+def warm_caches():
+    """Pre-fetch the news searches so the scheduled run starts from a warm cache"""
+    logger = logging.getLogger(__name__)
+    try:
+        from tools import warm_search_cache, search_cache_stats
+        warm_search_cache()
+        logger.info(f"Search cache stats: {search_cache_stats()}")
+        return True
+    except Exception as e:
+        logger.error(f"Cache warm-up failed: {e}")
+        return False
+
+def schedule_daily_run(use_cache=True):
     """Schedule the daily run at market close time"""
     try:
         import schedule
@@ -54,7 +66,8 @@ def schedule_daily_run():
         print("The 'schedule' package is not installed. Install it with: pip install schedule")
         return
 
-    schedule.every().day.at("16:30").do(run_summary)
+    schedule.every().day.at("16:25").do(warm_caches)
+    schedule.every().day.at("16:30").do(run_summary, use_cache=use_cache)
 
     print("Scheduled daily market summary at 4:30 PM EST")
     print("Press Ctrl+C to stop the scheduler")
@@ -69,9 +82,12 @@ def schedule_daily_run():
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description="Daily Market Summary Generator")
-    parser.add_argument("--mode", choices=["once", "schedule", "test"], default="once", help="Run mode")
+    parser.add_argument("--mode", choices=["once", "schedule", "test", "warm"], default="once", help="Run mode")
     parser.add_argument("--force", action="store_true", help="Force run even if market is open")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose logging")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk LLM response cache")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Resume a failed run from its checkpoints ('latest' for the most recent unfinished run)")
 
     args = parser.parse_args()
 
@@ -86,7 +102,10 @@ def main():
         print("Configuration validation passed!")
         return 0
 
-    if not args.force and not is_market_closed():
+    if args.mode == "warm":
+        return 0 if warm_caches() else 1
+
+    if not args.force and not args.resume and not is_market_closed():
         print("Warning: US market appears to be open.")
         print("Use --force to run anyway, or wait for market close.")
         response = input("Continue anyway? (y/N): ")
@@ -94,10 +113,10 @@ def main():
             return 0
 
     if args.mode == "once":
-        success = run_summary()
+        success = run_summary(use_cache=not args.no_cache, resume=args.resume)
         return 0 if success else 1
     elif args.mode == "schedule":
-        schedule_daily_run()
+        schedule_daily_run(use_cache=not args.no_cache)
         return 0
 
     return 0
@@ -1,19 +1,78 @@
 # tasks.py
 
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
 from crewai import Task
+from pydantic import BaseModel, Field, ValidationError
 from textwrap import dedent
 
+_IMAGE_LINK = re.compile(r'!\[.*?\]\(.*?\)')
+
+
+class BatchTranslationOutput(BaseModel):
+    translations: Dict[str, str] = Field(..., description="Translated markdown keyed by language code")
+
+
+def parse_batch_translation(raw: str, languages: List[str], source_text: str) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Validate the JSON returned by a batch translation task.
+    Returns the usable translations and the languages that are missing or invalid.
+    """
+    translations: Dict[str, str] = {}
+    try:
+        start, end = raw.index('{'), raw.rindex('}') + 1
+        output = BatchTranslationOutput.model_validate(json.loads(raw[start:end]))
+    except (ValueError, ValidationError):
+        return translations, list(languages)
+
+    expected_images = len(_IMAGE_LINK.findall(source_text))
+    for lang in languages:
+        text = output.translations.get(lang)
+        if not isinstance(text, str) or not text.strip():
+            continue
+        # A translation that dropped image links has not preserved the markdown.
+        if len(_IMAGE_LINK.findall(text)) != expected_images:
+            continue
+        translations[lang] = text.strip()
+    return translations, [lang for lang in languages if lang not in translations]
+
+
+def parse_segment_translation(raw: str, expected: int) -> Optional[List[str]]:
+    """Return the translated segments from a JSON array reply, or None if it does not line up."""
+    try:
+        start, end = raw.index('['), raw.rindex(']') + 1
+        segments = json.loads(raw[start:end])
+    except ValueError:
+        return None
+    if not isinstance(segments, list) or len(segments) != expected:
+        return None
+    if not all(isinstance(segment, str) and segment.strip() for segment in segments):
+        return None
+    return segments
+
+
 class MarketTasks:
+    # Topics the search stage looks for; the context compressor ranks sentences against them too.
+    SEARCH_TOPICS = [
+        "Major stock market index movements (S&P 500, NASDAQ).",
+        "Significant economic data releases (e.g., inflation, jobs reports).",
+        "Federal Reserve policy statements or hints.",
+        "Major news for market-leading companies.",
+    ]
+
     def create_search_task(self, agent):
+        topic_list = ("\n" + " " * 16).join(f"- {topic}" for topic in self.SEARCH_TOPICS)
         return Task(
             description=dedent(f"""
                 Search for the most critical US financial market news from the last 24 hours.
                 Your goal is to find a small, curated list of the absolute most important stories.
                 Focus on the top 3-5 most impactful developments related to:
-                - Major stock market index movements (S&P 500, NASDAQ).
-                - Significant economic data releases (e.g., inflation, jobs reports).
-                - Federal Reserve policy statements or hints.
-                - Major news for market-leading companies.
+                {topic_list}
+
+                If news results have been provided as context, work from those first and only
+                search again when they do not cover these topics.
 
                 Compile the essential facts and URLs from your search. Do not write a summary, just
                 gather the raw, vital information needed for the analyst.
@@ -29,7 +88,20 @@ class MarketTasks:
             async_execution=False
         )
 
-    def create_summary_task(self, agent):
+    def create_summary_task(self, agent, market_facts: Optional[str] = None, facts_current: bool = True):
+        facts_section = ""
+        if market_facts and facts_current:
+            facts_section = dedent("""
+                **Verified market data:** the figures below were computed from today's exchange prices.
+                Take index, sector and stock numbers from this table rather than from the news text,
+                and use the news only to explain them.
+            """) + market_facts + "\n"
+        elif market_facts:
+            facts_section = dedent("""
+                **Stored market data (not from today's session):** the figures below were computed from
+                the last stored exchange prices, dated in the table. Use them only as background and
+                state their date if you quote them; take today's moves from the news text.
+            """) + market_facts + "\n"
         return Task(
             description=dedent(f"""
                 Analyze the provided financial news data. Your task is to create an extremely
@@ -41,7 +113,7 @@ class MarketTasks:
                     (e.g., Market Performance, Economic News, Key Movers, Outlook).
                 3.  Be direct and data-driven. Avoid conversational fluff or speculation.
                 4.  Do not add any introductory or concluding paragraphs outside of the bullet points.
-            """),
+            """) + facts_section,
             expected_output=dedent("""
                 A four-point bulleted list summarizing the day's market activity. The entire text
                 must be under 250 words. The summary should be professional, clear, and ready for
@@ -91,4 +163,47 @@ class MarketTasks:
             """),
             agent=agent,
             async_execution=False
-        )
\ No newline at end of file
+        )
+
+    def create_batch_translation_task(self, agent, languages):
+        codes = ", ".join(languages)
+        example = json.dumps({"translations": {lang: "..." for lang in languages}})
+        return Task(
+            description=dedent(f"""
+                Translate the provided formatted market summary into each of these languages
+                (ISO codes): **{codes}**.
+
+                **Follow these strict rules:**
+                1.  Translate the text accurately, preserving the original financial terminology and meaning.
+                2.  Keep the original markdown formatting (headings, bullet points, image links) intact in every translation.
+                3.  Do **not** add any extra words, phrases, or explanations that were not in the original English text.
+                4.  Respond with a single JSON object and nothing else, shaped exactly like:
+                    {example}
+            """),
+            expected_output=dedent(f"""
+                A JSON object with a "translations" key mapping each language code ({codes}) to the
+                complete translated markdown summary.
+            """),
+            agent=agent,
+            async_execution=False
+        )
+
+    def create_segment_translation_task(self, agent, lang):
+        return Task(
+            description=dedent(f"""
+                The provided context is a JSON array of text segments taken from a formatted market
+                summary (headings, bullet text, labels and sentences). Translate every segment into **{lang}**.
+
+                **Follow these strict rules:**
+                1.  Translate each segment accurately, preserving the original financial terminology and meaning.
+                2.  Keep any inline markdown (bold, italics, links), numbers, tickers and index names intact.
+                3.  Return exactly one translated string per input segment, in the same order.
+                4.  Respond with a single JSON array of strings and nothing else.
+            """),
+            expected_output=dedent(f"""
+                A JSON array with the same number of strings as the input, each one the {lang}
+                translation of the segment at the same position.
+            """),
+            agent=agent,
+            async_execution=False
+        )
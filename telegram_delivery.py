@@ -0,0 +1,421 @@
+# telegram_delivery.py
+
+"""
+Asynchronous Telegram Bot API delivery.
+
+All sends go through one TelegramDelivery engine:
+- requests share a pooled keep-alive httpx client;
+- a global token bucket keeps the bot under Telegram's overall flood limit and
+  one bucket per chat keeps each chat under its own limit, so many chats can
+  be served at once without tripping either;
+- text longer than 4096 characters (1024 for photo captions) is split at
+  paragraph, then line, then word boundaries, keeping HTML tags balanced;
+- 429 responses are retried after the server's retry_after, and network or
+  5xx errors with exponential backoff;
+- images go out as albums of up to 10 per sendMediaGroup, and an image
+  Telegram has already stored is sent by its file_id (kept in the disk cache
+  by content hash) instead of being uploaded again.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+
+from config import Config
+from disk_cache import DiskCache
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TEXT_LIMIT = 4096
+CAPTION_LIMIT = 1024
+MEDIA_GROUP_LIMIT = 10
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+_TAG = re.compile(r'<(/?)([a-z]+)(?:\s[^>]*)?>')
+_PARSE_ERROR = "can't parse entities"
+# 400 descriptions for a file_id Telegram no longer accepts (expired, or issued to another bot)
+_FILE_ID_ERROR = re.compile(r'file identifier|wrong remote file|file reference', re.IGNORECASE)
+
+
+class TelegramError(Exception):
+    """A Bot API call that failed for good (after any retries)."""
+
+    def __init__(self, description: str, error_code: int = None):
+        super().__init__(description)
+        self.error_code = error_code
+
+
+@dataclass
+class DeliveryResult:
+    chat_id: str
+    ok: bool = False
+    message_ids: List[int] = field(default_factory=list)
+    attempts: int = 0
+    latency_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _open_tags(text: str) -> List[Tuple[str, str]]:
+    """(name, opening tag) for every tag still open at the end of `text`."""
+    stack: List[Tuple[str, str]] = []
+    for match in _TAG.finditer(text):
+        closing, name = match.group(1), match.group(2)
+        if not closing:
+            stack.append((name, match.group(0)))
+        elif stack and stack[-1][0] == name:
+            stack.pop()
+    return stack
+
+
+def _pieces(text: str, limit: int) -> Iterable[str]:
+    """Split `text` into units no longer than `limit`: paragraphs, else lines, else words, else characters."""
+    for separator in ('\n\n', '\n', ' '):
+        if separator in text:
+            parts = text.split(separator)
+            for index, part in enumerate(parts):
+                trailing = separator if index < len(parts) - 1 else ''
+                if len(part) + len(trailing) <= limit:
+                    yield part + trailing
+                else:
+                    # Split the oversized part on its own; its separator follows as a unit of its own.
+                    yield from _pieces(part, limit)
+                    if trailing:
+                        yield trailing
+            return
+    for start in range(0, len(text), limit):
+        yield text[start:start + limit]
+
+
+def split_message(text: str, limit: int = TEXT_LIMIT) -> List[str]:
+    """
+    Split HTML-formatted text into chunks of at most `limit` characters,
+    preferring paragraph boundaries. Tags open at a cut are closed at the end
+    of one chunk and reopened at the start of the next.
+    """
+    text = text.strip()
+    if len(text) <= limit:
+        return [text] if text else []
+    # Leave room for tags closed and reopened around a cut.
+    budget = max(limit - 64, limit // 2)
+    chunks: List[str] = []
+    current = ''
+    for piece in _pieces(text, budget):
+        if current and len(current) + len(piece) > budget:
+            chunks.append(current)
+            current = ''
+        current += piece
+    if current:
+        chunks.append(current)
+
+    balanced = []
+    prefix = ''
+    for chunk in chunks:
+        chunk = prefix + chunk
+        still_open = _open_tags(chunk)
+        balanced.append(chunk.strip() + ''.join(f"</{name}>" for name, _ in reversed(still_open)))
+        prefix = ''.join(tag for _, tag in still_open)
+    return [chunk for chunk in balanced if chunk]
+
+
+def strip_tags(text: str) -> str:
+    return _TAG.sub('', text).replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&')
+
+
+class TelegramDelivery:
+    """Rate-limited, retrying Bot API client shared by every send in the process."""
+
+    def __init__(self, token: str = None, api_url: str = None, messages_per_second: float = None,
+                 chat_messages_per_minute: float = None, max_retries: int = None, file_ids: DiskCache = None):
+        self.token = token or Config.TELEGRAM_BOT_TOKEN
+        self.api_url = (api_url or Config.TELEGRAM_API_URL).rstrip('/')
+        per_second = messages_per_second or Config.TELEGRAM_MESSAGES_PER_SECOND
+        self.chat_rate = chat_messages_per_minute or Config.TELEGRAM_CHAT_MESSAGES_PER_MINUTE
+        self.max_retries = Config.TELEGRAM_MAX_RETRIES if max_retries is None else max_retries
+        self.global_bucket = TokenBucket(per_second, per_second * 60)
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._blocked_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.file_ids = file_ids or DiskCache(
+            "telegram_file_ids",
+            ttl_seconds=Config.TELEGRAM_FILE_ID_TTL_DAYS * 86400,
+            max_bytes=1024 * 1024,
+        )
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self.stats = {'requests': 0, 'retries': 0, 'throttled_seconds': 0.0,
+                      'uploads': 0, 'upload_bytes': 0, 'file_id_hits': 0}
+
+    def client(self) -> httpx.AsyncClient:
+        """A pooled client for one event loop; use as `async with delivery.client() as client`."""
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=Config.HTTP_POOL_SIZE,
+                                max_keepalive_connections=Config.HTTP_POOL_SIZE),
+        )
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                # A small burst, then the sustained per-chat rate.
+                bucket = TokenBucket(3, self.chat_rate)
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    async def _throttle(self, chat_id: str):
+        with self._lock:
+            blocked_until = self._blocked_until.get(chat_id, 0.0)
+        wait = max(self.global_bucket.reserve(), self._chat_bucket(chat_id).reserve(),
+                   blocked_until - time.monotonic())
+        if wait > 0:
+            with self._lock:
+                self.stats['throttled_seconds'] += wait
+            await asyncio.sleep(wait)
+
+    async def call(self, client: httpx.AsyncClient, method: str, chat_id: str, data: dict,
+                   files: dict = None, result: DeliveryResult = None) -> dict:
+        """Call a Bot API method for `chat_id`, retrying flood-control and transient failures."""
+        url = f"{self.api_url}/bot{self.token}/{method}"
+        data = {**data, 'chat_id': chat_id}
+        for attempt in range(self.max_retries + 1):
+            await self._throttle(chat_id)
+            if result is not None:
+                result.attempts += 1
+            with self._lock:
+                self.stats['requests'] += 1
+            delay = None
+            try:
+                if files:
+                    response = await client.post(url, data=data, files=files)
+                else:
+                    response = await client.post(url, json=data)
+            except httpx.HTTPError as e:
+                response, body = None, {'description': f"{type(e).__name__}: {e}"}
+            else:
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {'description': response.text[:200]}
+
+            if body.get('ok'):
+                return body['result']
+            error_code = body.get('error_code') or (response.status_code if response is not None else None)
+            description = body.get('description', 'Unknown error')
+
+            if error_code == 429:
+                delay = float(body.get('parameters', {}).get('retry_after', 1))
+                # Later sends to this chat wait too, not just this retry.
+                with self._lock:
+                    self._blocked_until[chat_id] = time.monotonic() + delay
+            elif error_code == 400 and _PARSE_ERROR in description and data.get('parse_mode'):
+                logger.warning(f"Telegram rejected the markup for chat {chat_id}, resending as plain text")
+                data = {key: value for key, value in data.items() if key != 'parse_mode'}
+                for key in ('text', 'caption'):
+                    if key in data:
+                        data[key] = strip_tags(data[key])
+                delay = 0.0
+            elif error_code is None or error_code >= 500:
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+            if delay is None or attempt == self.max_retries:
+                raise TelegramError(description, error_code)
+            with self._lock:
+                self.stats['retries'] += 1
+            logger.warning(f"Telegram {method} to {chat_id} failed ({description}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        raise TelegramError("retries exhausted")
+
+    async def send_text(self, client: httpx.AsyncClient, chat_id: str, text: str, parse_mode: str = 'HTML',
+                        result: DeliveryResult = None) -> List[int]:
+        """Send `text` as one or more messages, in order; returns their message ids."""
+        message_ids = []
+        for chunk in split_message(text, TEXT_LIMIT):
+            data = {'text': chunk, 'disable_web_page_preview': True}
+            if parse_mode:
+                data['parse_mode'] = parse_mode
+            sent = await self.call(client, 'sendMessage', chat_id, data, result=result)
+            message_ids.append(sent['message_id'])
+        return message_ids
+
+    def _image_digest(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            with open(path, 'rb') as handle:
+                digest = hashlib.sha256(handle.read()).hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def _file_id_key(self, digest: str) -> str:
+        # file_ids are only valid for the bot that received them
+        return DiskCache.make_key(self.token.split(':')[0], digest)
+
+    def _prepare_media(self, paths: Sequence[str], use_cache: bool = True) -> Tuple[List[dict], dict, List[str]]:
+        """InputMediaPhoto entries plus multipart uploads for images Telegram has not seen yet."""
+        media, files, digests = [], {}, []
+        for index, path in enumerate(paths):
+            digest = self._image_digest(path)
+            digests.append(digest)
+            file_id = self.file_ids.get(self._file_id_key(digest)) if use_cache else None
+            if file_id:
+                media.append({'type': 'photo', 'media': file_id})
+                with self._lock:
+                    self.stats['file_id_hits'] += 1
+                continue
+            with open(path, 'rb') as handle:
+                content = handle.read()
+            name = f"photo{index}"
+            files[name] = (os.path.basename(path), content, mimetypes.guess_type(path)[0] or 'image/jpeg')
+            media.append({'type': 'photo', 'media': f"attach://{name}"})
+            with self._lock:
+                self.stats['uploads'] += 1
+                self.stats['upload_bytes'] += len(content)
+        return media, files, digests
+
+    def _remember_file_ids(self, digests: List[str], messages: List[dict]):
+        for digest, message in zip(digests, messages):
+            sizes = message.get('photo') or []
+            if sizes:
+                # Telegram returns every resolution; the last is the original size.
+                self.file_ids.set(self._file_id_key(digest), sizes[-1]['file_id'])
+
+    async def _send_album(self, client: httpx.AsyncClient, chat_id: str, paths: Sequence[str], caption: str,
+                          parse_mode: str, result: DeliveryResult, use_cache: bool = True) -> List[int]:
+        """One sendPhoto or sendMediaGroup request for up to MEDIA_GROUP_LIMIT images."""
+        media, files, digests = self._prepare_media(paths, use_cache)
+        if caption:
+            media[0]['caption'] = caption
+            if parse_mode:
+                media[0]['parse_mode'] = parse_mode
+        try:
+            if len(media) == 1:
+                data = {key: value for key, value in media[0].items() if key not in ('type', 'media')}
+                if files:
+                    sent = [await self.call(client, 'sendPhoto', chat_id, data,
+                                            files={'photo': files.popitem()[1]}, result=result)]
+                else:
+                    sent = [await self.call(client, 'sendPhoto', chat_id, {**data, 'photo': media[0]['media']},
+                                            result=result)]
+            else:
+                data = {'media': json.dumps(media, ensure_ascii=False)}
+                sent = await self.call(client, 'sendMediaGroup', chat_id, data, files=files or None, result=result)
+        except TelegramError as e:
+            if e.error_code == 400 and _PARSE_ERROR in str(e) and caption and parse_mode:
+                # sendMediaGroup carries the caption inside the media JSON, where call() cannot strip it.
+                logger.warning(f"Telegram rejected the caption markup for chat {chat_id}, resending as plain text")
+                return await self._send_album(client, chat_id, paths, strip_tags(caption), None, result, use_cache)
+            if e.error_code == 400 and _FILE_ID_ERROR.search(str(e)) and use_cache and len(files) < len(media):
+                # A cached file_id was rejected (expired or from another bot): upload everything once.
+                logger.warning(f"Telegram rejected a cached file_id for chat {chat_id}, uploading instead: {e}")
+                for digest in digests:
+                    self.file_ids.delete(self._file_id_key(digest))
+                return await self._send_album(client, chat_id, paths, caption, parse_mode, result, use_cache=False)
+            raise
+        self._remember_file_ids(digests, sent)
+        return [message['message_id'] for message in sent]
+
+    async def send_photos(self, client: httpx.AsyncClient, chat_id: str, image_paths: Sequence[str],
+                          caption: str = '', parse_mode: str = 'HTML', result: DeliveryResult = None) -> List[int]:
+        """
+        Send images as albums of up to 10, reusing Telegram file_ids for images
+        uploaded before. A caption that fits goes on the first album; a longer
+        text is sent first as its own messages.
+        """
+        message_ids = []
+        caption = caption.strip() if caption else ''
+        if len(caption) > CAPTION_LIMIT:
+            message_ids.extend(await self.send_text(client, chat_id, caption, parse_mode, result=result))
+            caption = ''
+        for start in range(0, len(image_paths), MEDIA_GROUP_LIMIT):
+            group = image_paths[start:start + MEDIA_GROUP_LIMIT]
+            message_ids.extend(await self._send_album(client, chat_id, group, caption, parse_mode, result))
+            caption = ''
+        return message_ids
+
+    async def deliver(self, client: httpx.AsyncClient, chat_id: str, text: str,
+                      image_paths: Sequence[str] = (), parse_mode: str = 'HTML') -> DeliveryResult:
+        """Send one message (optionally with images) to one chat; failures are reported, not raised."""
+        result = DeliveryResult(chat_id=str(chat_id))
+        start = time.perf_counter()
+        try:
+            if image_paths:
+                result.message_ids = await self.send_photos(client, chat_id, list(image_paths), text, parse_mode,
+                                                            result)
+            else:
+                result.message_ids = await self.send_text(client, chat_id, text, parse_mode, result)
+            result.ok = True
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"Telegram delivery to {chat_id} failed: {e}")
+        result.latency_seconds = time.perf_counter() - start
+        return result
+
+    async def broadcast(self, chat_ids: Iterable[str], text: str, image_paths: Sequence[str] = (),
+                        parse_mode: str = 'HTML') -> Dict[str, DeliveryResult]:
+        """Send the same message to every chat concurrently, within the global and per-chat limits."""
+        chat_ids = list(dict.fromkeys(str(chat_id) for chat_id in chat_ids))
+        results = []
+        async with self.client() as client:
+            if image_paths and len(chat_ids) > 1:
+                # The first chat uploads the images; the rest reuse the returned file_ids.
+                results.append(await self.deliver(client, chat_ids[0], text, image_paths, parse_mode))
+                chat_ids = chat_ids[1:]
+            results.extend(await asyncio.gather(*(
+                self.deliver(client, chat_id, text, image_paths, parse_mode) for chat_id in chat_ids
+            )))
+        return {result.chat_id: result for result in results}
+
+    def send(self, chat_id: str, text: str, image_paths: Sequence[str] = (),
+             parse_mode: str = 'HTML') -> DeliveryResult:
+        """Blocking wrapper for synchronous callers such as CrewAI tools."""
+        return run_sync(self.broadcast([chat_id], text, image_paths, parse_mode))[str(chat_id)]
+
+
+def run_sync(coroutine):
+    """Run a coroutine to completion from synchronous code, even if this thread already runs a loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = asyncio.run(coroutine)
+        except BaseException as e:  # re-raised in the calling thread
+            outcome['error'] = e
+
+    worker = threading.Thread(target=target, name="telegram-delivery")
+    worker.start()
+    worker.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+
+_telegram_delivery: Optional[TelegramDelivery] = None
+_telegram_delivery_lock = threading.Lock()
+
+
+def get_telegram_delivery() -> TelegramDelivery:
+    """The process-wide delivery engine, so every caller shares the same flood-limit buckets."""
+    global _telegram_delivery
+    with _telegram_delivery_lock:
+        if _telegram_delivery is None:
+            _telegram_delivery = TelegramDelivery()
+        return _telegram_delivery
@@ -16,20 +16,62 @@ except Exception:
         # CrewAI expects tools to expose a run method; delegate to _run
         def run(self, *args: Any, **kwargs: Any):  # noqa: D401
             return self._run(*args, **kwargs)
-from typing import Type, Optional
+from typing import List, Type, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pydantic import BaseModel, Field
-import requests
 import json
 import logging
 from datetime import datetime
-import yfinance as yf
-import matplotlib.pyplot as plt
 import os
+import threading
 from config import Config
-from utils import download_image, clean_text
+from disk_cache import DiskCache
+from market_data import get_provider, summarize_quotes
+from chart_renderer import ChartJob, cached_chart_path, render_charts
+from utils import download_image, clean_text, get_http_session
+from image_cache import get_image_fetcher, local_image_path
+from markdown_ast import parse_markdown, render_telegram
+from telegram_delivery import get_telegram_delivery
 
 logger = logging.getLogger(__name__)
 
+# ---------------- Search Response Cache ---------------- #
+_search_caches = {}
+_search_caches_lock = threading.Lock()
+
+def _search_cache(kind: str) -> DiskCache:
+    """Lazily open the compressed Tavily response cache for 'news' or 'images'"""
+    with _search_caches_lock:
+        if kind not in _search_caches:
+            ttl = {
+                'news': Config.NEWS_SEARCH_CACHE_TTL_SECONDS,
+                'images': Config.IMAGE_SEARCH_CACHE_TTL_SECONDS,
+            }[kind]
+            _search_caches[kind] = DiskCache(
+                f"tavily_{kind}",
+                ttl_seconds=ttl,
+                max_bytes=int(Config.SEARCH_CACHE_MAX_MB * 1024 * 1024),
+                compress=True,
+            )
+        return _search_caches[kind]
+
+def _search_cache_key(payload: dict) -> str:
+    """Key on the normalised query and every request parameter except the API key"""
+    params = {k: v for k, v in payload.items() if k not in ('api_key', 'query')}
+    return DiskCache.make_key(' '.join(payload['query'].lower().split()), params)
+
+def search_cache_stats() -> dict:
+    """Hit/miss counters for the Tavily caches opened in this process"""
+    with _search_caches_lock:
+        caches = list(_search_caches.values())
+    return {cache.namespace: cache.stats() for cache in caches}
+
+def warm_search_cache() -> int:
+    """Refresh the news cache for every configured query, e.g. shortly before the scheduled run"""
+    results = tavily_search_tool.search_many(Config.NEWS_SEARCH_QUERIES, refresh=True)
+    logger.info(f"Warmed Tavily news cache with {len(Config.NEWS_SEARCH_QUERIES)} queries ({len(results)} items)")
+    return len(results)
+
 # ---------------- Tavily Search ---------------- #
 class TavilySearchInput(BaseModel):
     query: str = Field(..., description="Search query for financial news")
@@ -40,59 +82,97 @@ class TavilySearchTool(BaseTool):
     description: str = "Search for the latest US financial market news using Tavily API"
     args_schema: Type[BaseModel] = TavilySearchInput
 
+    def _search(self, query: str, max_results: int = 10, refresh: bool = False) -> List[dict]:
+        """Run one Tavily query over the shared keep-alive session, served from cache when fresh"""
+        url = "https://api.tavily.com/search"
+        payload = {
+            "api_key": Config.TAVILY_API_KEY,
+            "query": query,
+            "search_depth": "advanced",
+            "include_answer": True,
+            "include_images": True,
+            "include_raw_content": False,
+            "max_results": max_results,
+            "include_domains": [
+                "reuters.com", "bloomberg.com", "cnbc.com", "marketwatch.com",
+                "wsj.com", "ft.com", "yahoo.com/finance", "investing.com"
+            ]
+        }
+
+        cache = _search_cache('news')
+        cache_key = _search_cache_key(payload)
+        if not refresh:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        response = get_http_session().post(url, json=payload, timeout=30)
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        # Format the results
+        results = []
+        if 'results' in data:
+            for item in data['results']:
+                result = {
+                    'title': item.get('title', ''),
+                    'url': item.get('url', ''),
+                    'content': item.get('content', ''),
+                    'published_date': item.get('published_date', ''),
+                    'score': item.get('score', 0)
+                }
+                results.append(result)
+        
+        # Include AI summary if available
+        if 'answer' in data and data['answer']:
+            results.insert(0, {
+                'title': 'AI Summary',
+                'content': data['answer'],
+                'url': '',
+                'published_date': datetime.now().isoformat(),
+                'score': 1.0
+            })
+        
+        cache.set(cache_key, results)
+        return results
+
     def _run(self, query: str, max_results: int = 10) -> str:
         """Search for financial news using Tavily API"""
 
         try:
-            url = "https://api.tavily.com/search"
-            payload = {
-                "api_key": Config.TAVILY_API_KEY,
-                "query": query,
-                "search_depth": "advanced",
-                "include_answer": True,
-                "include_images": True,
-                "include_raw_content": False,
-                "max_results": max_results,
-                "include_domains": [
-                    "reuters.com", "bloomberg.com", "cnbc.com", "marketwatch.com",
-                    "wsj.com", "ft.com", "yahoo.com/finance", "investing.com"
-                ]
-            }
-            
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Format the results
-            results = []
-            if 'results' in data:
-                for item in data['results']:
-                    result = {
-                        'title': item.get('title', ''),
-                        'url': item.get('url', ''),
-                        'content': item.get('content', ''),
-                        'published_date': item.get('published_date', ''),
-                        'score': item.get('score', 0)
-                    }
-                    results.append(result)
-            
-            # Include AI summary if available
-            if 'answer' in data and data['answer']:
-                results.insert(0, {
-                    'title': 'AI Summary',
-                    'content': data['answer'],
-                    'url': '',
-                    'published_date': datetime.now().isoformat(),
-                    'score': 1.0
-                })
-            
-            return json.dumps(results, indent=2)
-            
+            return json.dumps(self._search(query, max_results), indent=2)
         except Exception as e:
             logger.error(f"Tavily search failed: {e}")
             return json.dumps([{"error": f"Search failed: {str(e)}"}])
 
+    def search_many(self, queries: List[str], max_results: int = 10, concurrency: Optional[int] = None,
+                    refresh: bool = False) -> List[dict]:
+        """
+        Run several queries at once over the shared session and merge the results,
+        deduplicated by URL (highest score wins) and sorted by score.
+        A failed query is logged and skipped.
+        """
+        workers = max(1, min(concurrency or Config.SEARCH_CONCURRENCY, len(queries) or 1))
+        merged = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tavily") as pool:
+            futures = {pool.submit(self._search, query, max_results, refresh): query for query in queries}
+            for future in as_completed(futures):
+                query = futures[future]
+                try:
+                    items = future.result()
+                except Exception as e:
+                    logger.error(f"Tavily search failed for '{query}': {e}")
+                    continue
+                for item in items:
+                    # AI summaries have no URL; keep one per query.
+                    key = item['url'] or f"answer:{query}"
+                    if item['url'] == '':
+                        item = dict(item, title=f"AI Summary: {query}")
+                    if key not in merged or item['score'] > merged[key]['score']:
+                        merged[key] = item
+        return sorted(merged.values(), key=lambda item: item.get('score') or 0, reverse=True)
+
 # ---------------- Market Data ---------------- #
 class MarketDataInput(BaseModel):
     symbols: str = Field(..., description="Comma-separated list of stock symbols (e.g., 'AAPL,MSFT,GOOGL')")
@@ -104,51 +184,41 @@ class MarketDataTool(BaseTool):
     args_schema: Type[BaseModel] = MarketDataInput
 
     def _run(self, symbols: str, period: str = "1d") -> str:
-        """Fetch market data and create charts"""
+        """Fetch market data for all symbols in one batched request and create charts"""
         try:
             os.makedirs("temp_images", exist_ok=True)  # ensure folder exists
-            symbol_list = [s.strip().upper() for s in symbols.split(',')]
-            results = {}
+            symbol_list = [s.strip().upper() for s in symbols.split(',') if s.strip()]
+            frame = get_provider().fetch(symbol_list, period)
+            quotes = summarize_quotes(frame, symbol_list)
             
-            for symbol in symbol_list:
-                try:
-                    ticker = yf.Ticker(symbol)
-                    hist = ticker.history(period=period)
-                    
-                    if not hist.empty:
-                        # Get current price
-                        current_price = hist['Close'].iloc[-1]
-                        prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else current_price
-                        change = current_price - prev_close
-                        change_pct = (change / prev_close) * 100 if prev_close else 0
-                        
-                        # Create simple chart
-                        plt.figure(figsize=(10, 6))
-                        plt.plot(hist.index, hist['Close'], linewidth=2)
-                        plt.title(f'{symbol} - {period} Performance')
-                        plt.xlabel('Time')
-                        plt.ylabel('Price ($)')
-                        plt.grid(True, alpha=0.3)
-                        plt.xticks(rotation=45)
-                        plt.tight_layout()
-                        
-                        # Save chart
-                        chart_filename = f"chart_{symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                        chart_path = f"temp_images/{chart_filename}"
-                        plt.savefig(chart_path, dpi=150, bbox_inches='tight')
-                        plt.close()
-                        
-                        results[symbol] = {
-                            'current_price': round(current_price, 2),
-                            'change': round(change, 2),
-                            'change_percent': round(change_pct, 2),
-                            'chart_path': chart_path,
-                            'volume': int(hist['Volume'].iloc[-1]) if 'Volume' in hist.columns else 0
-                        }
-                        
-                except Exception as e:
-                    logger.error(f"Failed to fetch data for {symbol}: {e}")
-                    results[symbol] = {'error': str(e)}
+            # Render every chart off the main thread in one batch; unchanged charts come from the cache
+            jobs = []
+            for symbol in quotes:
+                close = frame['Close'][symbol].dropna()
+                timestamps = close.index.values
+                closes = close.to_numpy(dtype=float)
+                jobs.append(ChartJob(
+                    symbol=symbol,
+                    period=period,
+                    timestamps=timestamps,
+                    closes=closes,
+                    path=cached_chart_path(symbol, period, timestamps, closes),
+                ))
+            charts = {chart.symbol: chart for chart in render_charts(jobs)}
+            
+            results = {}
+            for symbol, quote in quotes.items():
+                chart = charts[symbol]
+                if chart.error:
+                    results[symbol] = {'error': chart.error}
+                    continue
+                results[symbol] = {
+                    'current_price': quote['current_price'],
+                    'change': quote['change'],
+                    'change_percent': quote['change_percent'],
+                    'chart_path': chart.path,
+                    'volume': quote['volume']
+                }
             
             return json.dumps(results, indent=2)
             
@@ -182,13 +252,19 @@ class ImageSearchTool(BaseTool):
                 ]
             }
             
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            cache = _search_cache('images')
+            cache_key = _search_cache_key(payload)
+            data = cache.get(cache_key)
+            if data is None:
+                response = get_http_session().post(url, json=payload, timeout=30)
+                response.raise_for_status()
+                data = response.json()
+                cache.set(cache_key, {'images': data.get('images', [])})
             
             images = []
             if 'images' in data:
+                # Download every result at once; download_image then only resizes (or reuses) each file
+                get_image_fetcher().fetch_many(data['images'][:max_results])
                 for img_url in data['images'][:max_results]:
                     try:
                         # Download and save image
@@ -213,46 +289,29 @@ class TelegramSendInput(BaseModel):
     message: str = Field(..., description="Message content to send")
     chat_id: str = Field(..., description="Telegram chat ID or @channelusername")
     image_path: Optional[str] = Field(None, description="Path to image file to send")
+    image_paths: Optional[List[str]] = Field(None, description="Paths of several images (e.g. charts) to send as one album")
 
 class TelegramSendTool(BaseTool):
     name: str = "telegram_sender"
-    description: str = "Send messages and images to Telegram channel"
+    description: str = "Send messages and images to Telegram channel; several images are sent as one album"
     args_schema: Type[BaseModel] = TelegramSendInput
 
-    def _run(self, message: str, chat_id: str, image_path: Optional[str] = None) -> str:
+    def _run(self, message: str, chat_id: str, image_path: Optional[str] = None,
+             image_paths: Optional[List[str]] = None) -> str:
         """Send message to Telegram"""
         try:
-            bot_token = Config.TELEGRAM_BOT_TOKEN
-            base_url = f"https://api.telegram.org/bot{bot_token}"
-            
-            if image_path:
-                # Send photo with caption
-                url = f"{base_url}/sendPhoto"
-                with open(image_path, 'rb') as photo:
-                    files = {'photo': photo}
-                    data = {
-                        'chat_id': chat_id,
-                        'caption': message,
-                        'parse_mode': 'Markdown'
-                    }
-                    response = requests.post(url, files=files, data=data, timeout=30)
-            else:
-                # Send text message
-                url = f"{base_url}/sendMessage"
-                data = {
-                    'chat_id': chat_id,
-                    'text': message,
-                    'parse_mode': 'Markdown'
-                }
-                response = requests.post(url, json=data, timeout=30)
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            if result.get('ok'):
-                return json.dumps({"success": True, "message_id": result['result']['message_id']})
+            # The agents write markdown; Telegram gets it as HTML, split to fit its length limits.
+            text = render_telegram(parse_markdown(message))
+            # Images are batched into albums of up to 10, and ones sent before are not uploaded again.
+            # Paths come from the agent, so only charts and cached images are sent.
+            images = [path for path in dict.fromkeys(([image_path] if image_path else []) + (image_paths or []))
+                      if local_image_path(path)]
+            result = get_telegram_delivery().send(chat_id, text, image_paths=images)
+            if result.ok:
+                return json.dumps({"success": True, "message_id": result.message_ids[0] if result.message_ids else None,
+                                   "message_ids": result.message_ids})
             else:
-                return json.dumps({"success": False, "error": result.get('description', 'Unknown error')})
+                return json.dumps({"success": False, "error": result.error or 'Unknown error'})
                 
         except Exception as e:
             logger.error(f"Telegram send failed: {e}")
@@ -0,0 +1,140 @@
+# translation_memory.py
+
+"""
+Segment-level translation memory for the formatted summaries.
+
+The markdown is split into translatable segments (heading text, bullet text,
+bold labels such as "**S&P 500**:" and the sentences of each line) while
+markup, image lines and purely numeric fragments are kept verbatim, so a
+one-word edit in a long paragraph re-translates one sentence, not the line.
+Segments are looked up by (source hash, target language), so only new text
+has to go to the LLM.
+"""
+
+import hashlib
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Union
+
+from config import Config
+from disk_cache import DiskCache
+from utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_LINE_PREFIX = re.compile(r'^(\s*(?:#{1,6}\s+|[-*+]\s+|\d+[.)]\s+|>\s*)?)(.*?)(\s*)$')
+_BOLD_LABEL = re.compile(r'^(\*\*)([^*]+?)(:\*\*\s*|\*\*:\s*)(.*)$')
+_PASSTHROUGH = re.compile(r'^\s*(?:!\[.*?\]\(.*?\)|[-*_]{3,}|\|?[\s:|-]+\|?)\s*$')
+_HAS_LETTERS = re.compile(r'[^\W\d_]')
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+(?=["\'(\[*A-Z])')
+
+
+class Segment(str):
+    """A piece of source text that needs translating."""
+
+
+class SegmentedDocument:
+    """Markdown split into literal markup and translatable segments, in order."""
+
+    def __init__(self, parts: List[Union[str, Segment]]):
+        self.parts = parts
+
+    @property
+    def segments(self) -> List[Segment]:
+        """Unique segments in first-seen order."""
+        return list(dict.fromkeys(part for part in self.parts if isinstance(part, Segment)))
+
+    def render(self, translations: Dict[str, str]) -> str:
+        """Rebuild the document, substituting each segment's translation."""
+        return ''.join(translations.get(part, part) if isinstance(part, Segment) else part for part in self.parts)
+
+
+def _split_text(text: str) -> List[Union[str, Segment]]:
+    if not _HAS_LETTERS.search(text):
+        return [text]
+    label = _BOLD_LABEL.match(text)
+    if label:
+        opening, name, closing, rest = label.groups()
+        parts = [opening, Segment(name) if _HAS_LETTERS.search(name) else name, closing]
+        if rest:
+            parts.extend(_split_text(rest))
+        return parts
+    return _split_sentences(text)
+
+
+def _split_sentences(text: str) -> List[Union[str, Segment]]:
+    """Sentences as segments with the whitespace between them kept verbatim; never splits inside a span."""
+    parts: List[Union[str, Segment]] = []
+    start = 0
+    for match in _SENTENCE_BREAK.finditer(text):
+        head = text[start:match.start()]
+        if head.count('**') % 2 or head.count('`') % 2 or head.count('[') != head.count(']'):
+            continue
+        parts.extend([Segment(head) if _HAS_LETTERS.search(head) else head, match.group(0)])
+        start = match.end()
+    tail = text[start:]
+    parts.append(Segment(tail) if _HAS_LETTERS.search(tail) else tail)
+    return parts
+
+
+def segment_markdown(text: str) -> SegmentedDocument:
+    """Split formatted markdown into markup and translatable segments."""
+    parts: List[Union[str, Segment]] = []
+    lines = text.split('\n')
+    for index, line in enumerate(lines):
+        if line.strip() and not _PASSTHROUGH.match(line):
+            prefix, body, trailing = _LINE_PREFIX.match(line).groups()
+            parts.append(prefix)
+            parts.extend(_split_text(body))
+            parts.append(trailing)
+        else:
+            parts.append(line)
+        if index < len(lines) - 1:
+            parts.append('\n')
+    return SegmentedDocument(parts)
+
+
+class TranslationMemory:
+    """Persistent store of segment translations with per-language hit-rate statistics."""
+
+    def __init__(self, cache: DiskCache = None):
+        self.cache = cache or DiskCache(
+            "translation_memory",
+            ttl_seconds=Config.TRANSLATION_MEMORY_TTL_DAYS * 86400,
+            max_bytes=int(Config.TRANSLATION_MEMORY_MAX_MB * 1024 * 1024),
+        )
+        self.stats = defaultdict(lambda: {'lookups': 0, 'hits': 0, 'tokens_saved': 0})
+
+    @staticmethod
+    def _key(segment: str, lang: str) -> str:
+        return f"{hashlib.sha256(segment.encode('utf-8')).hexdigest()}:{lang}"
+
+    def lookup(self, segments: Iterable[str], lang: str) -> Dict[str, str]:
+        """Return the stored translations for whichever `segments` are known."""
+        found = {}
+        stats = self.stats[lang]
+        for segment in segments:
+            stats['lookups'] += 1
+            target = self.cache.get(self._key(segment, lang))
+            if target is not None:
+                found[segment] = target
+                stats['hits'] += 1
+                stats['tokens_saved'] += count_tokens(segment)
+        return found
+
+    def store(self, translations: Dict[str, str], lang: str):
+        for segment, target in translations.items():
+            self.cache.set(self._key(segment, lang), target)
+
+    def hit_rate(self, lang: str = None) -> float:
+        rows = [self.stats[lang]] if lang else list(self.stats.values())
+        lookups = sum(row['lookups'] for row in rows)
+        return sum(row['hits'] for row in rows) / lookups if lookups else 0.0
+
+    def log_stats(self):
+        for lang, row in self.stats.items():
+            logger.info(
+                f"Translation memory [{lang}]: {row['hits']}/{row['lookups']} segments reused "
+                f"({self.hit_rate(lang):.0%}), ~{row['tokens_saved']} source tokens not re-sent"
+            )
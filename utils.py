@@ -1,11 +1,26 @@
 import os
 import logging
+import threading
 from datetime import datetime, timezone
 import pytz
 from typing import List, Dict, Any
 import requests
-from PIL import Image
-import io
+from config import Config
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """Shared keep-alive HTTP session with a connection pool sized for concurrent callers"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=Config.HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
 
 def setup_logging():
     """Set up logging configuration"""
@@ -51,25 +66,45 @@ def is_market_closed():
     return not (market_open.time() <= now.time() <= market_close.time())
 
 def download_image(url: str, max_size: tuple = (800, 600)) -> str:
-    """Download and resize an image from URL"""
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        # Open image and resize
-        img = Image.open(io.BytesIO(response.content))
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save to local file
-        filename = f"temp_image_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        filepath = os.path.join('temp_images', filename)
-        os.makedirs('temp_images', exist_ok=True)
-        
-        img.save(filepath, 'JPEG', quality=85)
-        return filepath
-    except Exception as e:
-        logging.error(f"Failed to download image from {url}: {e}")
-        return None
+    """Download (or reuse) an image from URL and return the path of a resized JPEG copy"""
+    from image_cache import get_image_fetcher
+    return get_image_fetcher().thumbnail(url, max_size)
+
+def prune_directory(directory: str, max_bytes: int, max_age_seconds: float = None, pattern: str = '*') -> int:
+    """Delete files older than max_age_seconds, then least recently used ones until under max_bytes"""
+    import glob
+    import time
+
+    entries = []
+    now = time.time()
+    removed = 0
+    for path in glob.glob(os.path.join(directory, pattern)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path):
+            continue
+        if max_age_seconds and now - stat.st_mtime > max_age_seconds:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logging.warning(f"Failed to remove {path}: {e}")
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+            total -= size
+        except OSError as e:
+            logging.warning(f"Failed to remove {path}: {e}")
+    return removed
 
 def clean_text(text: str) -> str:
     """Clean and format text for better readability"""
@@ -84,6 +119,30 @@ def clean_text(text: str) -> str:
     
     return text.strip()
 
+_token_encoder = None
+_token_encoder_loaded = False
+
+def _get_token_encoder():
+    """Load the tiktoken encoder once; None if tiktoken or its vocabulary is unavailable"""
+    global _token_encoder, _token_encoder_loaded
+    if not _token_encoder_loaded:
+        _token_encoder_loaded = True
+        try:
+            import tiktoken
+            _token_encoder = tiktoken.get_encoding(Config.TOKENIZER_ENCODING)
+        except Exception as e:
+            logging.warning(f"tiktoken unavailable ({e}); falling back to approximate token counts")
+    return _token_encoder
+
+def count_tokens(text: str) -> int:
+    """Token count for budgeting LLM calls (tiktoken when available, else about 4 characters per token)"""
+    if not text:
+        return 0
+    encoder = _get_token_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
 def validate_summary(summary: str, max_words: int = 500) -> bool:
     """Validate that summary meets requirements"""
     if not summary: